@@ -0,0 +1,569 @@
+"""
+POS・待ち行列ログからのシミュレーションパラメータ推定（キャリブレーション）
+
+数GB規模のCSVログをチャンク単位でストリーミング処理し、十分統計量だけを
+保持することで、1年分のデータでも一定のメモリ量で推定を行う。
+ログが複数のファイル（日単位・月単位など）に分かれている場合は、ファイルごとに
+プロセスプールで並列に集計し、十分統計量を合算する。
+推定結果は `simulation_parameters.py` と同じ形式のパラメータモジュールとして出力する。
+
+入力ログの形式（時刻は pandas.to_datetime で解釈できる文字列）:
+
+待ち行列ログ（1行 = 1組、到着時刻の昇順に並んでいること）
+    arrival_time   : 到着時刻
+    group_size     : グループの人数
+    seated_time    : 着席時刻（空欄 = 待ちきれずに帰った）
+    served_time    : 料理の提供時刻（空欄可）
+    checkout_time  : 会計を始めた時刻（省略可）
+    departure_time : 退店時刻（帰った組は諦めて帰った時刻）
+
+POSログ（1行 = 1品）
+    order_time      : 注文時刻
+    item            : メニュー名
+    cook_start_time : 調理を始めた時刻（省略可）
+    served_time     : 提供時刻
+
+シミュレーションは調理スタッフ・ホールスタッフの待ち時間、会計処理時間、待ち行列の長さに
+よる来客の減少を別に再現するため、ログの値からそれらを除いて推定する。
+- 到着間隔: 直前の到着時点の待ち行列の長さによる来客の減少率を掛け、待ち行列がない場合の
+  間隔に補正する。天候の影響はログにないため補正しない。
+- 調理時間: 調理開始から提供までの時間で推定する。cook_start_time がない場合、注文から
+  提供までの時間には調理スタッフの待ち時間が含まれるため、元のパラメータを使う。
+- 食事時間: 提供から会計開始までの時間で推定する。checkout_time がない場合は、提供から
+  退店までの時間から会計処理時間（CHECKOUT_TIME_RANGE）の平均と分散を差し引く。
+  この場合、会計の待ち時間の分だけ長めに推定される。
+推定方法は出力するパラメータモジュールの先頭にも記録する。
+
+注意:
+- 時間帯（lunch/dinner）と曜日区分（weekday/weekend）の判定はシミュレーション本体と同じ。
+- 待ち行列ログを複数のファイルに分ける場合は日の境目で分けること（ファイルをまたぐ
+  到着間隔と待ち行列の状態は引き継がない）。
+"""
+
+import argparse
+import collections
+import math
+import os
+import pprint
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import simulation_parameters
+
+QUEUE_LOG_COLUMNS = ["arrival_time", "group_size", "seated_time", "served_time", "departure_time"]
+QUEUE_LOG_OPTIONAL_COLUMNS = ["checkout_time"]
+POS_LOG_COLUMNS = ["order_time", "item", "served_time"]
+POS_LOG_OPTIONAL_COLUMNS = ["cook_start_time"]
+
+SEGMENTS = [
+    ("weekday", "lunch"), ("weekday", "dinner"),
+    ("weekend", "lunch"), ("weekend", "dinner"),
+]
+
+MAX_GROUP_SIZE = 4  # シミュレーションで扱うグループの最大人数
+PATIENCE_HISTOGRAM_MAX = 180  # 忍耐度ヒストグラムの上限（分）
+PATIENCE_BIN_WIDTH = 1  # 忍耐度ヒストグラムの幅（分）
+DEFAULT_CHUNKSIZE = 500_000  # 1チャンクあたりの行数
+DEFAULT_MIN_SAMPLES = 30  # この件数未満の推定値は採用せず元のパラメータを使う
+MIN_ORDER_WEIGHT = 0.001  # ログに注文がないメニューの order_weight（0 にすると品切れ時に選べなくなる）
+
+
+class RunningStats:
+    """件数・平均・分散をまとめて保持する統計量（チャンク単位で合算可能）"""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # 平均からの偏差の二乗和
+
+    def update(self, values):
+        """値の配列を取り込む（Chanの並列アルゴリズムで合算）"""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        self.merge_moments(values.size, batch_mean, batch_m2)
+
+    def merge(self, other):
+        """別の統計量を合算"""
+        self.merge_moments(other.count, other.mean, other.m2)
+
+    def merge_moments(self, count, mean, m2):
+        """件数・平均・偏差二乗和を合算"""
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    @property
+    def std(self):
+        """標本標準偏差"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class SegmentAccumulator:
+    """時間帯区分ごとの十分統計量"""
+    def __init__(self, segment):
+        self.segment = segment
+        self.arrival_intervals = RunningStats()  # 待ち行列による来客の減少を補正した到着間隔
+        self.group_size_counts = np.zeros(MAX_GROUP_SIZE, dtype=np.int64)
+        n_bins = PATIENCE_HISTOGRAM_MAX // PATIENCE_BIN_WIDTH + 1
+        self.walkout_counts = np.zeros(n_bins, dtype=np.int64)  # 諦めて帰った組（観測）
+        self.censored_counts = np.zeros(n_bins, dtype=np.int64)  # 着席できた組（打ち切り）
+        self.last_arrival = None  # チャンクをまたぐ到着間隔のための (日付, 時刻, 待ち行列の長さ)
+
+    def merge(self, other):
+        """別のファイルから集計した統計量を合算"""
+        self.arrival_intervals.merge(other.arrival_intervals)
+        self.group_size_counts += other.group_size_counts
+        self.walkout_counts += other.walkout_counts
+        self.censored_counts += other.censored_counts
+
+
+class CalibrationAccumulator:
+    """ログ全体から集計する十分統計量"""
+    def __init__(self):
+        self.segments = {segment: SegmentAccumulator(segment) for segment in SEGMENTS}
+        self.eating_time = RunningStats()  # 提供から会計開始まで
+        self.post_serving_time = RunningStats()  # 提供から退店まで（会計を含む）
+        self.cooking_time = collections.defaultdict(RunningStats)  # 調理開始から提供まで
+        self.order_counts = collections.Counter()
+        self.queue_exits = np.array([])  # チャンクをまたいで待っている組が待ち行列を離れる時刻
+        self.queue_rows = 0
+        self.pos_rows = 0
+
+    def merge(self, other):
+        """別のファイルから集計した統計量を合算"""
+        for segment, seg in self.segments.items():
+            seg.merge(other.segments[segment])
+        self.eating_time.merge(other.eating_time)
+        self.post_serving_time.merge(other.post_serving_time)
+        for item, stats in other.cooking_time.items():
+            self.cooking_time[item].merge(stats)
+        self.order_counts.update(other.order_counts)
+        self.queue_rows += other.queue_rows
+        self.pos_rows += other.pos_rows
+
+
+def _to_minutes(series):
+    """時刻列をエポックからの経過分（欠損は NaN）に変換"""
+    return (pd.to_datetime(series) - pd.Timestamp(0)) / pd.Timedelta(minutes=1)
+
+
+def _segment_labels(arrival):
+    """到着時刻から (曜日区分, 時間帯) のラベル列を作成"""
+    day_type = np.where(arrival.dt.dayofweek >= 5, "weekend", "weekday")
+    hour = arrival.dt.hour
+    time_of_day = np.where((hour >= 11) & (hour < 15), "lunch", "dinner")
+    return day_type, time_of_day
+
+
+def _patience_bins(minutes):
+    """経過分をヒストグラムのビン番号に変換"""
+    bins = np.floor(np.clip(minutes, 0, PATIENCE_HISTOGRAM_MAX) / PATIENCE_BIN_WIDTH)
+    return bins.astype(np.int64)
+
+
+def queue_arrival_factor(queue_length):
+    """待ち行列の長さによる来客数の倍率（シミュレーション本体と同じ式）"""
+    return np.maximum(
+        simulation_parameters.MIN_QUEUE_ARRIVAL_FACTOR,
+        1 - queue_length * simulation_parameters.QUEUE_ARRIVAL_DECAY
+    )
+
+
+def queue_lengths_at_arrival(arrival_min, queue_exit, carried_exits):
+    """各組の到着時点で先に並んでいた組数を計算
+
+    arrival_min は昇順の到着時刻、queue_exit は各組が待ち行列を離れた時刻（着席または
+    諦めて帰った時刻）、carried_exits は前のチャンクから持ち越した退出時刻。
+    戻り値は (組数の配列, 次のチャンクに持ち越す退出時刻)。
+    """
+    exits = np.sort(np.concatenate((carried_exits, queue_exit)))
+    earlier = carried_exits.size + np.arange(arrival_min.size)
+    # 後から到着した組は到着時刻より前に離れることはないため、到着時刻より前の退出だけ数えればよい
+    left = np.searchsorted(exits, arrival_min, side="left")
+    carried = exits[np.searchsorted(exits, arrival_min[-1], side="left"):]
+    return earlier - left, carried
+
+
+def accumulate_queue_chunk(acc, chunk):
+    """待ち行列ログの1チャンクを集計"""
+    arrival = pd.to_datetime(chunk["arrival_time"])
+    valid = arrival.notna().to_numpy()
+    chunk = chunk[valid]
+    arrival = arrival[valid]
+    if chunk.empty:
+        return
+    acc.queue_rows += len(chunk)
+    order = np.argsort(arrival.to_numpy(), kind="stable")
+    chunk = chunk.iloc[order]
+    arrival = arrival.iloc[order]
+
+    arrival_min = _to_minutes(arrival).to_numpy()
+    seated_min = _to_minutes(chunk["seated_time"]).to_numpy()
+    served_min = _to_minutes(chunk["served_time"]).to_numpy()
+    departure_min = _to_minutes(chunk["departure_time"]).to_numpy()
+    day = arrival.dt.normalize().to_numpy()
+    group_size = np.clip(chunk["group_size"].fillna(1).to_numpy(dtype=int), 1, MAX_GROUP_SIZE)
+    walked_out = np.isnan(seated_min)
+    day_type, time_of_day = _segment_labels(arrival)
+
+    # 各組が待ち行列を離れた時刻（不明な場合は到着時刻）と、到着時点の待ち行列の長さ
+    queue_exit = np.where(walked_out, departure_min, seated_min)
+    queue_exit = np.where(np.isnan(queue_exit), arrival_min, queue_exit)
+    queue_length, acc.queue_exits = queue_lengths_at_arrival(arrival_min, queue_exit, acc.queue_exits)
+
+    for segment in SEGMENTS:
+        mask = (day_type == segment[0]) & (time_of_day == segment[1])
+        if not mask.any():
+            continue
+        seg = acc.segments[segment]
+
+        # 到着間隔（同じ日・同じ時間帯の連続する到着のみ）。シミュレーションは直前の到着時点の
+        # 待ち行列の長さで到着間隔を延ばすため、その倍率を掛けて待ち行列がない場合の間隔に戻す
+        times = arrival_min[mask]
+        days = day[mask]
+        lengths = queue_length[mask]
+        if seg.last_arrival is not None:
+            days = np.concatenate(([seg.last_arrival[0]], days))
+            times = np.concatenate(([seg.last_arrival[1]], times))
+            lengths = np.concatenate(([seg.last_arrival[2]], lengths))
+        same_day = days[1:] == days[:-1]
+        intervals = np.diff(times) * queue_arrival_factor(lengths[:-1])
+        seg.arrival_intervals.update(intervals[same_day])
+        seg.last_arrival = (days[-1], times[-1], lengths[-1])
+
+        # グループサイズ
+        seg.group_size_counts += np.bincount(group_size[mask] - 1, minlength=MAX_GROUP_SIZE)
+
+        # 忍耐度（帰った組は観測値、着席できた組は待ち時間で打ち切り）
+        out = mask & walked_out & ~np.isnan(departure_min)
+        seg.walkout_counts += np.bincount(
+            _patience_bins(departure_min[out] - arrival_min[out]), minlength=seg.walkout_counts.size
+        )
+        seated = mask & ~walked_out
+        seg.censored_counts += np.bincount(
+            _patience_bins(seated_min[seated] - arrival_min[seated]), minlength=seg.censored_counts.size
+        )
+
+    # 食事時間（料理の提供から会計開始まで）と、料理の提供から退店までの時間
+    post_serving = departure_min - served_min
+    acc.post_serving_time.update(post_serving[~walked_out & (post_serving > 0)])
+    if "checkout_time" in chunk:
+        eating = _to_minutes(chunk["checkout_time"]).to_numpy() - served_min
+        acc.eating_time.update(eating[~walked_out & (eating > 0)])
+
+
+def accumulate_pos_chunk(acc, chunk):
+    """POSログの1チャンクを集計"""
+    chunk = chunk[chunk["item"].notna()]
+    if chunk.empty:
+        return
+    acc.pos_rows += len(chunk)
+    acc.order_counts.update(chunk["item"].value_counts().to_dict())
+
+    # 調理時間（調理開始から提供まで）。注文から提供までの時間は調理スタッフの待ち時間を含むため使わない
+    if "cook_start_time" not in chunk:
+        return
+    cooking = (_to_minutes(chunk["served_time"]) - _to_minutes(chunk["cook_start_time"])).to_numpy()
+    items = chunk["item"].to_numpy()
+    valid = np.isfinite(cooking) & (cooking >= 0)
+    for item in np.unique(items[valid]):
+        acc.cooking_time[item].update(cooking[valid & (items == item)])
+
+
+def accumulate_log_file(task):
+    """1つのログファイルをチャンク単位で読み込んで集計（プロセスプールのワーカーで呼ばれる）
+
+    task は (ログの種類 "queue" / "pos", ファイルパス, チャンクの行数)。
+    """
+    kind, path, chunksize = task
+    acc = CalibrationAccumulator()
+    if kind == "queue":
+        columns, accumulate = QUEUE_LOG_COLUMNS + QUEUE_LOG_OPTIONAL_COLUMNS, accumulate_queue_chunk
+    else:
+        columns, accumulate = POS_LOG_COLUMNS + POS_LOG_OPTIONAL_COLUMNS, accumulate_pos_chunk
+    for chunk in pd.read_csv(path, usecols=lambda c: c in columns, chunksize=chunksize):
+        accumulate(acc, chunk)
+    return acc
+
+
+def _as_paths(paths):
+    """ファイルパス1つまたはパスのリストをリストに揃える"""
+    if paths is None:
+        return []
+    if isinstance(paths, (str, os.PathLike)):
+        return [paths]
+    return list(paths)
+
+
+def stream_logs(queue_log_paths, pos_log_paths=None, chunksize=DEFAULT_CHUNKSIZE, workers=None):
+    """ログをチャンク単位で読み込み、十分統計量を集計
+
+    パスはファイル1つまたはリストで指定する。複数のファイルはプロセスプールで
+    ファイルごとに並列に集計し、結果を合算する。
+    """
+    tasks = [("queue", path, chunksize) for path in _as_paths(queue_log_paths)]
+    tasks += [("pos", path, chunksize) for path in _as_paths(pos_log_paths)]
+    if len(tasks) == 1 or workers == 1:
+        partials = [accumulate_log_file(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(accumulate_log_file, tasks))
+
+    acc = CalibrationAccumulator()
+    for partial in partials:
+        acc.merge(partial)
+    return acc
+
+
+def abandonment_curve(walkout_counts, censored_counts):
+    """忍耐度の生存曲線（Kaplan-Meier推定）を計算
+
+    戻り値は各ビンの終端時刻（分）におけるまだ待っていられる組の割合の配列。
+    """
+    at_risk = walkout_counts.sum() + censored_counts.sum()
+    survival = np.ones(walkout_counts.size)
+    current = 1.0
+    for i in range(walkout_counts.size):
+        if at_risk > 0:
+            current *= 1 - walkout_counts[i] / at_risk
+        survival[i] = current
+        at_risk -= walkout_counts[i] + censored_counts[i]
+    return survival
+
+
+def _survival_quantile(survival, q):
+    """生存曲線から累積確率 q に達する時刻（分）を取得（到達しない場合は None）"""
+    reached = np.nonzero(survival <= 1 - q)[0]
+    if reached.size == 0:
+        return None
+    return float((reached[0] + 1) * PATIENCE_BIN_WIDTH)
+
+
+def fit_segment(seg, min_samples=DEFAULT_MIN_SAMPLES):
+    """1つの時間帯区分について到着・グループサイズ・忍耐度を推定"""
+    result = {"segment": seg.segment}
+
+    if seg.arrival_intervals.count >= min_samples:
+        result["mean_interval"] = round(float(seg.arrival_intervals.mean), 3)
+
+    total_groups = seg.group_size_counts.sum()
+    if total_groups >= min_samples:
+        probs = seg.group_size_counts / total_groups
+        probs = np.round(probs, 3)
+        probs[np.argmax(probs)] += round(1 - probs.sum(), 3)  # 合計を1に揃える
+        result["group_size_probs"] = [float(p) for p in probs]
+
+    result["walkouts"] = int(seg.walkout_counts.sum())
+    result["censored"] = int(seg.censored_counts.sum())
+    result["survival"] = abandonment_curve(seg.walkout_counts, seg.censored_counts)
+    return result
+
+
+def fit_uniform_from_moments(mean, std, lower_bound=0.0):
+    """平均と標準偏差から一様分布の範囲を推定"""
+    half_width = math.sqrt(3) * std
+    low = max(lower_bound, mean - half_width)
+    high = max(low + 1.0, mean + half_width)
+    return (round(float(low), 1), round(float(high), 1))
+
+
+def fit_eating_time_range(acc, base, min_samples=DEFAULT_MIN_SAMPLES):
+    """食事時間の一様分布の範囲を推定
+
+    戻り値は (範囲, 推定方法の説明)。
+    """
+    if acc.eating_time.count >= min_samples:
+        stats = acc.eating_time
+        return fit_uniform_from_moments(stats.mean, stats.std, lower_bound=1.0), "提供から会計開始までの時間から推定"
+    stats = acc.post_serving_time
+    if stats.count >= min_samples:
+        # 提供から退店まで = 食事 + 会計の待ち時間 + 会計処理時間（一様分布）
+        low, high = base.CHECKOUT_TIME_RANGE
+        mean = stats.mean - (low + high) / 2
+        std = math.sqrt(max(0.0, stats.std ** 2 - (high - low) ** 2 / 12))
+        return (
+            fit_uniform_from_moments(mean, std, lower_bound=1.0),
+            "提供から退店までの時間から会計処理時間を差し引いて推定（会計の待ち時間の分だけ長めになる）"
+        )
+    return base.EATING_TIME_RANGE, "サンプル不足のため元の値"
+
+
+def fit_patience_range(acc, base_range):
+    """全区分をまとめた生存曲線の10%・90%点から一様分布の範囲を推定"""
+    walkouts = sum(seg.walkout_counts for seg in acc.segments.values())
+    censored = sum(seg.censored_counts for seg in acc.segments.values())
+    survival = abandonment_curve(walkouts, censored)
+    q10 = _survival_quantile(survival, 0.1)
+    q90 = _survival_quantile(survival, 0.9)
+    if q10 is None or q90 is None or q90 <= q10:
+        # 打ち切りが多く上側が推定できない場合は元の範囲を使う
+        return base_range
+    # 一様分布 U(a, b) では q10 = a + 0.1(b - a), q90 = a + 0.9(b - a)
+    width = (q90 - q10) / 0.8
+    low = max(0.0, q10 - 0.1 * width)
+    return (round(low, 1), round(low + width, 1))
+
+
+def fit_parameters(acc, base=simulation_parameters, min_samples=DEFAULT_MIN_SAMPLES):
+    """集計済みの統計量からパラメータを推定
+
+    サンプル数が min_samples 未満の項目は base の値をそのまま使う。
+    """
+    fitted_segments = [fit_segment(acc.segments[segment], min_samples) for segment in SEGMENTS]
+
+    customer_params = {day_type: {} for day_type, _ in SEGMENTS}
+    abandonment_curves = {day_type: {} for day_type, _ in SEGMENTS}
+    for fitted in fitted_segments:
+        day_type, time_of_day = fitted["segment"]
+        params = dict(base.CUSTOMER_PARAMS[day_type][time_of_day])
+        for key in ("mean_interval", "group_size_probs"):
+            if key in fitted:
+                params[key] = fitted[key]
+        customer_params[day_type][time_of_day] = params
+        # 5分刻みで間引いた生存曲線
+        step = max(1, 5 // PATIENCE_BIN_WIDTH)
+        curve = []
+        for i in range(step - 1, fitted["survival"].size, step):
+            curve.append(((i + 1) * PATIENCE_BIN_WIDTH, round(float(fitted["survival"][i]), 3)))
+            if fitted["survival"][i] <= 0:
+                break
+        abandonment_curves[day_type][time_of_day] = curve
+
+    menu = {name: dict(item) for name, item in base.MENU.items()}
+    total_orders = sum(acc.order_counts[name] for name in menu)
+    floored_items = []
+    if total_orders >= min_samples:
+        mean_count = total_orders / len(menu)
+        for name, item in menu.items():
+            weight = round(float(acc.order_counts[name] / mean_count), 3)
+            if weight < MIN_ORDER_WEIGHT:
+                weight = MIN_ORDER_WEIGHT
+                floored_items.append(name)
+            item["order_weight"] = weight
+    fitted_items = []
+    for name, item in menu.items():
+        stats = acc.cooking_time.get(name)
+        if stats is not None and stats.count >= min_samples:
+            item["cooking_time_mean"] = round(float(stats.mean), 2)
+            item["cooking_time_std"] = round(float(stats.std), 2)
+            fitted_items.append(name)
+    kept_items = [name for name in menu if name not in fitted_items]
+
+    eating_time_range, eating_note = fit_eating_time_range(acc, base, min_samples)
+
+    notes = ["到着間隔: 直前の到着時点の待ち行列による来客の減少を補正して推定（天候の影響は補正なし）"]
+    if fitted_items:
+        notes.append(f"調理時間: 調理開始から提供までの時間から推定（{', '.join(fitted_items)}）")
+    if kept_items:
+        notes.append(f"調理時間: 調理開始時刻がない、またはサンプル不足のため元の値（{', '.join(kept_items)}）")
+    notes.append(f"食事時間: {eating_note}")
+    if floored_items:
+        notes.append(
+            f"注文されやすさ: ログにほとんど注文がないため下限値 {MIN_ORDER_WEIGHT} を使用（{', '.join(floored_items)}）"
+        )
+
+    return {
+        "MENU": menu,
+        "CUSTOMER_PARAMS": customer_params,
+        "PATIENCE_RANGE": fit_patience_range(acc, base.PATIENCE_RANGE),
+        "EATING_TIME_RANGE": eating_time_range,
+        "ABANDONMENT_CURVES": abandonment_curves,
+        "NOTES": notes,
+    }
+
+
+def _format(name, value):
+    """変数の代入文を整形"""
+    return f"{name} = {pprint.pformat(value, sort_dicts=False, width=100)}\n"
+
+
+def render_parameter_module(fitted, base=simulation_parameters, source=None):
+    """推定結果を `simulation_parameters.py` と同じ形式のソースコードに変換"""
+    lines = ['"""\n飲食店待ち行列シミュレーションのパラメータ定義（ログから推定）\n']
+    if source:
+        lines.append(f"\n推定元: {source}\n")
+    lines.append("\n推定方法:\n")
+    lines.extend(f"- {note}\n" for note in fitted["NOTES"])
+    lines.append('"""\n\n')
+    lines.append("# 0除算防止用の極小値定数\n")
+    lines.append(f"EPSILON = {base.EPSILON!r}  # 非常に小さい値\n\n")
+    lines.append("# シミュレーションパラメータ\n")
+    for name in ("SEATS", "OPENING_HOUR", "CLOSING_HOUR", "KITCHEN_STAFF", "HALL_STAFF", "MONITOR_RESOURCES"):
+        lines.append(f"{name} = {getattr(base, name)!r}\n")
+    lines.append("\n# メニュー設定（order_weight・調理時間はログから推定、推定方法は先頭を参照）\n")
+    lines.append(_format("MENU", fitted["MENU"]))
+    lines.append("\n# 材料設定\n")
+    lines.append(_format("INGREDIENTS", base.INGREDIENTS))
+    lines.append("\n# 顧客生成パラメータ（ログから推定）\n")
+    lines.append(_format("CUSTOMER_PARAMS", fitted["CUSTOMER_PARAMS"]))
+    lines.append("\n# 忍耐度（待てる最大時間）の範囲（分）\n")
+    lines.append(_format("PATIENCE_RANGE", fitted["PATIENCE_RANGE"]))
+    lines.append("\n# 食事時間の範囲（分）\n")
+    lines.append(_format("EATING_TIME_RANGE", fitted["EATING_TIME_RANGE"]))
+    lines.append("\n# 会計処理時間の範囲（分）\n")
+    lines.append(_format("CHECKOUT_TIME_RANGE", base.CHECKOUT_TIME_RANGE))
+    lines.append("\n# 待ち行列の長さによる来客の減少（1組あたりの減少率と、来客数の倍率の下限）\n")
+    lines.append(f"QUEUE_ARRIVAL_DECAY = {base.QUEUE_ARRIVAL_DECAY!r}\n")
+    lines.append(f"MIN_QUEUE_ARRIVAL_FACTOR = {base.MIN_QUEUE_ARRIVAL_FACTOR!r}\n")
+    lines.append("\n# 天候影響係数\n")
+    lines.append(_format("WEATHER_FACTORS", base.WEATHER_FACTORS))
+    lines.append("\n# 参考: 時間帯別の忍耐度の生存曲線 [(待ち時間(分), まだ待てる組の割合), ...]\n")
+    lines.append(_format("ABANDONMENT_CURVES", fitted["ABANDONMENT_CURVES"]))
+    return "".join(lines)
+
+
+def calibrate(queue_log_paths, pos_log_paths=None, output_path="calibrated_parameters.py",
+              chunksize=DEFAULT_CHUNKSIZE, min_samples=DEFAULT_MIN_SAMPLES, workers=None):
+    """ログからパラメータを推定し、パラメータモジュールを書き出す
+
+    ログのパスはファイル1つまたはリストで指定する。
+    """
+    acc = stream_logs(queue_log_paths, pos_log_paths, chunksize=chunksize, workers=workers)
+    fitted = fit_parameters(acc, min_samples=min_samples)
+    source = ", ".join(str(p) for p in _as_paths(queue_log_paths) + _as_paths(pos_log_paths))
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(render_parameter_module(fitted, source=source))
+    return acc, fitted
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="POS・待ち行列ログからシミュレーションパラメータを推定")
+    parser.add_argument("queue_log", nargs="+", help="待ち行列ログ（CSV、日の境目で分けた複数ファイルも可）")
+    parser.add_argument("--pos-log", nargs="+", help="POSログ（CSV、複数ファイルも可）")
+    parser.add_argument("--output", default="calibrated_parameters.py", help="出力するパラメータモジュール")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="1チャンクあたりの行数")
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES, help="推定値を採用する最小サンプル数")
+    parser.add_argument("--workers", type=int, default=None, help="ファイルを並列に集計するプロセス数")
+    args = parser.parse_args()
+
+    acc, fitted = calibrate(
+        args.queue_log, args.pos_log, args.output,
+        chunksize=args.chunksize, min_samples=args.min_samples, workers=args.workers
+    )
+
+    print("\n===== パラメータ推定結果 =====")
+    print(f"待ち行列ログ: {acc.queue_rows}組, POSログ: {acc.pos_rows}品")
+    for day_type, time_of_day in SEGMENTS:
+        params = fitted["CUSTOMER_PARAMS"][day_type][time_of_day]
+        print(f"  {day_type}/{time_of_day}: 平均到着間隔 {params['mean_interval']}分, "
+              f"グループサイズ確率 {params['group_size_probs']}")
+    print(f"忍耐度の範囲: {fitted['PATIENCE_RANGE']}分")
+    print(f"食事時間の範囲: {fitted['EATING_TIME_RANGE']}分")
+    print("推定方法:")
+    for note in fitted["NOTES"]:
+        print(f"  {note}")
+    print(f"\nパラメータモジュールを {args.output} に保存しました。")
+
+
+if __name__ == "__main__":
+    main()
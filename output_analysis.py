@@ -0,0 +1,218 @@
+"""
+定常状態の出力分析（ウォームアップ検出・バッチ平均法・自動停止）
+
+開店直後の空いた状態から始まる過渡期の影響を MSER-5 で自動的に取り除き、
+1回の長いシミュレーションからバッチ平均法で信頼区間を求める。
+自動停止モードでは、指定した精度に達した時点で env.run を終了する。
+"""
+
+import argparse
+import copy
+
+import numpy as np
+from scipy.stats import t as student_t
+
+from restaurant_simulation import (
+    EPSILON, INGREDIENTS, CUSTOMER_PARAMS, build_simulation, finalize_metrics
+)
+
+MSER_BATCH_SIZE = 5  # MSER-5 で平均をとる観測値の数
+DEFAULT_BATCHES = 20  # バッチ平均法のバッチ数
+DEFAULT_CHECK_INTERVAL = 60  # 自動停止の判定間隔（分）
+DEFAULT_QUEUE_INTERVAL = 10  # 待ち行列の長さを時間平均する間隔（分）
+
+
+def waiting_time_series(metrics):
+    """着席できた顧客の待ち時間を到着順に並べた系列を作成"""
+    seated = sorted(
+        (c["arrival_time"], c["waiting_time"]) for c in metrics.customer_data if not c["walked_out"]
+    )
+    return np.array([waiting for _, waiting in seated], dtype=float)
+
+
+def queue_length_series(metrics, interval=DEFAULT_QUEUE_INTERVAL, start=0, end=None):
+    """待ち行列の長さ（階段関数）を一定間隔ごとに時間平均した系列を作成"""
+    points = sorted(metrics.queue_length_over_time)
+    if not points:
+        return np.array([])
+    if end is None:
+        end = points[-1][0]
+    n_intervals = int((end - start) // interval)
+    series = np.zeros(n_intervals)
+    times = [time for time, _ in points] + [end]
+    for (time, length), next_time in zip(points, times[1:]):
+        # [time, next_time) の区間の長さを各集計区間に配分
+        lo = max(time, start)
+        hi = min(next_time, start + n_intervals * interval)
+        while lo < hi:
+            k = int((lo - start) // interval)
+            boundary = min(hi, start + (k + 1) * interval)
+            series[k] += length * (boundary - lo)
+            lo = boundary
+    return series / interval
+
+
+def mser_truncation(series, batch_size=MSER_BATCH_SIZE):
+    """MSER-5 でウォームアップ期間（切り捨てる観測値の数）を検出
+
+    系列を batch_size 個ずつ平均し、切り捨て点 d ごとの
+    MSER(d) = Σ_{i>d} (Y_i - Ȳ_d)^2 / (n - d)^2 を最小にする d を選ぶ。
+    探索は系列の前半に限る。
+    """
+    n_batches = len(series) // batch_size
+    if n_batches < 2:
+        return 0
+    batches = np.asarray(series[:n_batches * batch_size], dtype=float).reshape(n_batches, batch_size).mean(axis=1)
+
+    # 後ろからの累積和で全ての切り捨て点の MSER を一度に計算
+    tail_sum = np.cumsum(batches[::-1])[::-1]
+    tail_sq_sum = np.cumsum(batches[::-1] ** 2)[::-1]
+    remaining = np.arange(n_batches, 0, -1)
+    mser = (tail_sq_sum - tail_sum ** 2 / remaining) / remaining ** 2
+
+    half = max(1, n_batches // 2)
+    return int(np.argmin(mser[:half])) * batch_size
+
+
+def batch_means_ci(series, n_batches=DEFAULT_BATCHES, confidence=0.95):
+    """バッチ平均法で平均値と信頼区間の半幅を計算
+
+    観測値が n_batches 個に満たない場合は半幅を無限大とする。
+    """
+    series = np.asarray(series, dtype=float)
+    batch_size = len(series) // n_batches
+    if batch_size < 1:
+        mean = float(series.mean()) if len(series) else 0.0
+        return mean, float("inf")
+    batches = series[:batch_size * n_batches].reshape(n_batches, batch_size).mean(axis=1)
+    mean = float(batches.mean())
+    std_error = batches.std(ddof=1) / np.sqrt(n_batches)
+    half_width = float(student_t.ppf((1 + confidence) / 2, n_batches - 1) * std_error)
+    return mean, half_width
+
+
+def steady_state_estimate(series, n_batches=DEFAULT_BATCHES, confidence=0.95):
+    """ウォームアップを取り除いた上でバッチ平均法の推定値を計算"""
+    truncation = mser_truncation(series)
+    mean, half_width = batch_means_ci(series[truncation:], n_batches, confidence)
+    return {
+        "truncation": truncation,
+        "observations": len(series) - truncation,
+        "mean": mean,
+        "half_width": half_width,
+    }
+
+
+def stationary_customer_params(day_type, time_of_day, customer_params=CUSTOMER_PARAMS):
+    """全ての曜日・時間帯で指定した区分の到着パラメータを使う顧客生成パラメータを作成
+
+    24時間営業と組み合わせることで、ディナーのピークが長く続くような定常状態を再現する。
+    """
+    params = customer_params[day_type][time_of_day]
+    return {
+        day: {segment: copy.deepcopy(params) for segment in segments}
+        for day, segments in customer_params.items()
+    }
+
+
+def _series(metrics, statistic, now):
+    """指定した統計量の系列を作成"""
+    if statistic == "waiting_time":
+        return waiting_time_series(metrics)
+    if statistic == "queue_length":
+        return queue_length_series(metrics, end=now)
+    raise ValueError(f"未対応の統計量です: {statistic}")
+
+
+def precision_monitor(env, restaurant, stop_event, statistic, relative_precision, check_interval,
+                      max_time, n_batches, confidence, min_observations):
+    """精度が目標に達したか定期的に確認し、達したら stop_event を発火するプロセス"""
+    while env.now + check_interval < max_time:
+        yield env.timeout(check_interval)
+        series = _series(restaurant.metrics, statistic, env.now)
+        if len(series) < min_observations:
+            continue
+        estimate = steady_state_estimate(series, n_batches, confidence)
+        if estimate["half_width"] <= relative_precision * max(abs(estimate["mean"]), EPSILON):
+            stop_event.succeed(estimate)
+            return
+    yield env.timeout(max_time - env.now)
+    stop_event.succeed(None)
+
+
+def run_until_precision(statistic="waiting_time", relative_precision=0.05, check_interval=DEFAULT_CHECK_INTERVAL,
+                        max_days=30, n_batches=DEFAULT_BATCHES, confidence=0.95, min_observations=None,
+                        **kwargs):
+    """目標精度に達するまでシミュレーションを実行（自動停止モード）
+
+    信頼区間の半幅が平均値の relative_precision 倍以下になった時点で env.run を終了する。
+    max_days 日分を実行しても達しなかった場合はそこで終了する。
+    残りのキーワード引数は build_simulation に渡す。ingredients_data を省略した場合は、
+    途中で材料が尽きて状態が変わらないよう、1時間あたり通常の1日分の在庫を持たせる。
+    この在庫は仮の値なので、返す指標の材料コストは使った分だけ仕入れたものとして計算する
+    （材料廃棄率は 0 になる）。
+    戻り値は (指標, 推定結果, 終了時刻（分）)。
+    """
+    if min_observations is None:
+        min_observations = n_batches * MSER_BATCH_SIZE * 2
+    max_time = max_days * 24 * 60
+    unlimited_stock = "ingredients_data" not in kwargs
+    if unlimited_stock:
+        kwargs["ingredients_data"] = copy.deepcopy(INGREDIENTS)
+        for data in kwargs["ingredients_data"].values():
+            data["initial_stock"] *= max_days * 24
+    env, restaurant = build_simulation(days=max_days, **kwargs)
+    stop_event = env.event()
+    env.process(precision_monitor(
+        env, restaurant, stop_event, statistic, relative_precision, check_interval,
+        max_time, n_batches, confidence, min_observations
+    ))
+    env.run(until=stop_event)
+
+    if unlimited_stock:
+        # 仮の在庫をコストに含めないよう、使った分だけを仕入れたことにする
+        for ing in restaurant.ingredients.values():
+            ing.initial_stock = ing.used_amount
+            ing.current_stock = 0
+    metrics = finalize_metrics(restaurant)
+    estimate = steady_state_estimate(_series(metrics, statistic, env.now), n_batches, confidence)
+    estimate["converged"] = stop_event.value is not None
+    return metrics, estimate, env.now
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="定常状態の出力分析（MSER-5・バッチ平均法・自動停止）")
+    parser.add_argument("--statistic", choices=["waiting_time", "queue_length"], default="waiting_time",
+                        help="分析する統計量")
+    parser.add_argument("--precision", type=float, default=0.05, help="目標とする相対精度（半幅 / 平均）")
+    parser.add_argument("--max-days", type=int, default=30, help="最大シミュレーション日数")
+    parser.add_argument("--batches", type=int, default=DEFAULT_BATCHES, help="バッチ数")
+    parser.add_argument("--segment", default=None,
+                        help="到着パラメータを固定する区分（例: weekday/dinner）。指定すると24時間営業で実行")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    args = parser.parse_args()
+
+    kwargs = {}
+    if args.segment:
+        day_type, time_of_day = args.segment.split("/")
+        kwargs["customer_params"] = stationary_customer_params(day_type, time_of_day)
+        kwargs["opening_hour"] = 0
+        kwargs["closing_hour"] = 24
+
+    _, estimate, end_time = run_until_precision(
+        statistic=args.statistic, relative_precision=args.precision,
+        max_days=args.max_days, n_batches=args.batches, seed=args.seed, **kwargs
+    )
+
+    print("\n===== 定常状態の出力分析 =====")
+    print(f"統計量: {args.statistic}")
+    print(f"終了時刻: {end_time:.0f}分（{end_time / (24 * 60):.1f}日）"
+          f"{'' if estimate['converged'] else ' ※目標精度に達しませんでした'}")
+    print(f"ウォームアップとして切り捨てた観測値: {estimate['truncation']}")
+    print(f"使用した観測値: {estimate['observations']}")
+    print(f"平均: {estimate['mean']:.3f} ± {estimate['half_width']:.3f}（95%信頼区間）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+多段分割法（multilevel splitting）による稀な事象の確率推定
+
+待ち行列の長さ（len(restaurant.waiting_line)）に段階的な水準を設け、軌道が水準に
+達するたびにその時点のスナップショットから splitting_factor 本の複製を作り、
+それぞれ独立な乱数で続きを実行する。複製には 1 / splitting_factor の重みを掛けるため、
+推定量は不偏になる。根の軌道ごとの寄与は互いに独立なので、その平均と標準誤差から
+信頼区間を求める。
+
+計算量は CPU 時間で測り（スナップショットの保存・復元を含む）、分割しない通常の
+シミュレーション1回あたりの CPU 時間を基準に「通常の実行何回分か」に換算する。
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import norm
+
+from restaurant_simulation import CUSTOMER_PARAMS, build_simulation, finalize_metrics
+from snapshot import restore_snapshot, take_snapshot
+
+DEFAULT_LEVELS = list(range(10, 19))  # 待ち行列の長さの水準（組）
+DEFAULT_SPLITTING_FACTOR = 3  # 水準に達した軌道の複製数
+DEFAULT_BASELINE_RUNS = 20  # 計算量の基準にする通常のシミュレーションの回数
+MIN_HITS_FOR_EFFICIENCY = 10  # 効率（単純なモンテカルロとの比）を表示する最小の到達数
+
+
+def _seed(seed_sequence):
+    """SeedSequence から整数の乱数シードを作成"""
+    return int(seed_sequence.generate_state(1)[0])
+
+
+def _target_reached(metrics, target):
+    """営業終了時の指標が目標の事象に該当するか判定"""
+    name, threshold = target
+    return getattr(metrics, name) >= threshold
+
+
+def _run_stage(env, restaurant, level, end_time):
+    """待ち行列が level に達するか終了時刻になるまで実行し、達したかどうかを返す"""
+    reached = restaurant.watch_queue_length(level)
+    env.run(until=env.any_of([reached, env.timeout(max(0, end_time - env.now))]))
+    return reached.triggered
+
+
+def _explore(env, restaurant, stage, weight, seed_sequence, levels, splitting_factor, target,
+             end_time, customer_params, weather_schedule, stats):
+    """軌道を次の水準まで進め、達したら複製して再帰的に続ける
+
+    戻り値は重み付きの寄与。stats["trials"] / stats["crossings"] には水準ごとの
+    試行数・到達数を加算する。
+    """
+    reached = False
+    if stage < len(levels):
+        reached = _run_stage(env, restaurant, levels[stage], end_time)
+        stats["trials"][stage] += 1
+        stats["crossings"][stage] += reached
+
+    if not reached:
+        if target is None:
+            # 最終水準に達する前に営業が終わった
+            return 0.0
+        if env.now < end_time:
+            env.run(until=end_time)
+        return weight * _target_reached(finalize_metrics(restaurant), target)
+
+    if target is None and stage == len(levels) - 1:
+        # 最終水準に到達
+        return weight
+
+    # 水準に達した時点の状態から独立な乱数で複製
+    snapshot = take_snapshot(restaurant, customer_params, weather_schedule)
+    total = 0.0
+    for child in seed_sequence.spawn(splitting_factor):
+        child_env, child_restaurant = restore_snapshot(snapshot, seed=_seed(child))
+        total += _explore(
+            child_env, child_restaurant, stage + 1, weight / splitting_factor, child, levels,
+            splitting_factor, target, end_time, customer_params, weather_schedule, stats
+        )
+    return total
+
+
+def run_root(task):
+    """根の軌道1本とその複製を実行（プロセスプールのワーカーで呼ばれる）
+
+    戻り値は (重み付きの寄与, 集計値の辞書)。集計値の "cpu_seconds" は複製を含めた CPU 時間。
+    """
+    started = time.process_time()
+    seed_sequence, levels, splitting_factor, target, kwargs = task
+    customer_params = kwargs.get("customer_params", CUSTOMER_PARAMS)
+    weather_schedule = kwargs.get("weather_schedule") or {0: "sunny"}
+    env, restaurant = build_simulation(seed=_seed(seed_sequence), **kwargs)
+    stats = {"trials": [0] * len(levels), "crossings": [0] * len(levels)}
+    contribution = _explore(
+        env, restaurant, 0, 1.0, seed_sequence, levels, splitting_factor, target,
+        _end_time(restaurant, target), customer_params, weather_schedule, stats
+    )
+    stats["cpu_seconds"] = time.process_time() - started
+    return contribution, stats
+
+
+def run_baseline(task):
+    """分割しない通常のシミュレーションを1回実行し、その CPU 時間を返す（ワーカーで呼ばれる）"""
+    started = time.process_time()
+    seed_sequence, target, kwargs = task
+    env, restaurant = build_simulation(seed=_seed(seed_sequence), **kwargs)
+    env.run(until=_end_time(restaurant, target))
+    finalize_metrics(restaurant)
+    return time.process_time() - started
+
+
+def _end_time(restaurant, target):
+    """軌道を終える時刻
+
+    待ち行列の長さの事象は閉店後には起こらないため、最終日の閉店時刻で打ち切る。
+    """
+    if target is None:
+        return restaurant.last_closing_time
+    return restaurant.days * 24 * 60
+
+
+def estimate_tail_probability(levels=DEFAULT_LEVELS, splitting_factor=DEFAULT_SPLITTING_FACTOR,
+                              n_roots=200, target=None, confidence=0.95, seed=None, workers=None,
+                              baseline_runs=DEFAULT_BASELINE_RUNS, **kwargs):
+    """多段分割法で稀な事象の確率を推定
+
+    target を省略すると「1日のうちに待ち行列の長さが levels[-1] 以上になる」確率を推定する。
+    target に (指標名, しきい値) を渡すと「営業終了時に指標がしきい値以上になる」確率を
+    推定する（例: ("walkout_rate", 0.4)）。この場合、水準は事象に近づく目安として使われる。
+    計算量の基準として、分割しない通常のシミュレーションを baseline_runs 回実行する。
+    到達した根の軌道が MIN_HITS_FOR_EFFICIENCY 未満の場合、標準誤差が信頼できないため
+    効率（"speedup"）は None とする。
+    事象に到達した根の軌道が1本もない場合、標準誤差から信頼区間は作れないため "ci" は None とし、
+    "upper_bound" に片側の信頼上限 1 - (1 - confidence)^(1 / n_roots)（3の法則）を返す。
+    各根の寄与は [0, 1] に収まり平均が p なので、寄与が正になる確率は p 以上であり、
+    全ての根の寄与が 0 になる確率は (1 - p)^n_roots 以下になることによる。
+    残りのキーワード引数は build_simulation に渡す。
+    """
+    levels = sorted(levels)
+    seeds = np.random.SeedSequence(seed).spawn(n_roots + baseline_runs)
+    tasks = [(root, levels, splitting_factor, target, kwargs) for root in seeds[:n_roots]]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run_root, tasks))
+        baseline_seconds = list(executor.map(
+            run_baseline, [(child, target, kwargs) for child in seeds[n_roots:]]
+        ))
+
+    contributions = np.array([c for c, _ in results])
+    cpu_seconds = sum(stats["cpu_seconds"] for _, stats in results)
+    run_seconds = float(np.mean(baseline_seconds))
+    trials = np.sum([stats["trials"] for _, stats in results], axis=0)
+    crossings = np.sum([stats["crossings"] for _, stats in results], axis=0)
+    probability = float(contributions.mean())
+    std_error = float(contributions.std(ddof=1) / np.sqrt(n_roots)) if n_roots > 1 else float("inf")
+    z = norm.ppf((1 + confidence) / 2)
+
+    # 計算量を通常の実行の回数に換算し、同じ分散を単純なモンテカルロで得るのに必要な回数と比べる
+    effort_runs = cpu_seconds / run_seconds
+    hits = int(np.count_nonzero(contributions))
+    naive_runs = probability * (1 - probability) / std_error ** 2 if std_error > 0 else None
+    speedup = naive_runs / effort_runs if naive_runs is not None and hits >= MIN_HITS_FOR_EFFICIENCY else None
+
+    if hits == 0:
+        ci = None
+        upper_bound = 1 - (1 - confidence) ** (1 / n_roots)
+    else:
+        ci = (max(0.0, probability - z * std_error), probability + z * std_error)
+        upper_bound = ci[1]
+    return {
+        "probability": probability,
+        "std_error": std_error,
+        "ci": ci,
+        "upper_bound": upper_bound,
+        "relative_error": std_error / probability if probability > 0 else float("inf"),
+        "roots": n_roots,
+        "hits": hits,
+        "level_trials": trials.tolist(),
+        "level_crossings": crossings.tolist(),
+        "cpu_seconds": cpu_seconds,
+        "run_cpu_seconds": run_seconds,
+        "effort_runs": effort_runs,
+        "naive_equivalent_runs": naive_runs,
+        "speedup": speedup,
+    }
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="多段分割法による稀な事象の確率推定")
+    parser.add_argument("--levels", type=int, nargs="+", default=DEFAULT_LEVELS, help="待ち行列の長さの水準（組）")
+    parser.add_argument("--splitting-factor", type=int, default=DEFAULT_SPLITTING_FACTOR, help="水準ごとの複製数")
+    parser.add_argument("--roots", type=int, default=200, help="根の軌道の数")
+    parser.add_argument("--walkout-rate", type=float, default=None,
+                        help="指定すると営業終了時のキャンセル率がこの値以上になる確率を推定")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数")
+    args = parser.parse_args()
+
+    target = ("walkout_rate", args.walkout_rate) if args.walkout_rate is not None else None
+    result = estimate_tail_probability(
+        levels=args.levels, splitting_factor=args.splitting_factor, n_roots=args.roots,
+        target=target, seed=args.seed, workers=args.workers
+    )
+
+    print("\n===== 多段分割法による稀な事象の確率推定 =====")
+    if target is None:
+        print(f"事象: 待ち行列の長さが {max(args.levels)}組 以上になる")
+    else:
+        print(f"事象: キャンセル率が {args.walkout_rate * 100:.0f}% 以上になる")
+    print(f"水準: {sorted(args.levels)}, 複製数: {args.splitting_factor}")
+    if result["ci"] is None:
+        print("事象に到達した根の軌道がないため、信頼区間は求められません")
+        print(f"確率の片側95%信頼上限: {result['upper_bound']:.3e}（根の軌道 {result['roots']}本にもとづく3の法則）")
+    else:
+        low, high = result["ci"]
+        print(f"推定確率: {result['probability']:.3e}（95%信頼区間 [{low:.3e}, {high:.3e}]）")
+        print(f"相対誤差: {result['relative_error'] * 100:.1f}%")
+    print(f"事象に到達した根の軌道: {result['hits']} / {result['roots']}")
+    print("水準ごとの到達率（複製数の目安は到達率の逆数）:")
+    for level, trials, crossings in zip(sorted(args.levels), result["level_trials"], result["level_crossings"]):
+        rate = crossings / trials if trials else 0
+        print(f"  {level}組: {crossings} / {trials} ({rate * 100:.1f}%)")
+    print(f"計算量: CPU時間 {result['cpu_seconds']:.1f}秒 = 通常のシミュレーション {result['effort_runs']:.1f}回分"
+          f"（1回 {result['run_cpu_seconds'] * 1000:.0f}ミリ秒）")
+    if result["speedup"] is not None:
+        print(f"同じ精度に必要な単純モンテカルロの反復: {result['naive_equivalent_runs']:.0f}回 "
+              f"（{result['speedup']:.1f}倍）")
+    elif result["naive_equivalent_runs"] is not None:
+        print(f"到達した根の軌道が {MIN_HITS_FOR_EFFICIENCY} 本未満のため、単純なモンテカルロとの効率比は表示しません")
+
+
+if __name__ == "__main__":
+    main()
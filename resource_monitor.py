@@ -0,0 +1,220 @@
+"""
+スタッフ（SimPyリソース）の利用状況モニタリング
+
+稼働中の人数と待ち行列の長さの時間積分、要求ごとの待ち時間と使用時間を記録する。
+状態が変わるのは request / release の呼び出し時だけなので、その直前に積分を更新すれば
+イベントごとの追加処理はわずかで済む。モニタリングを使わない場合は通常の
+simpy.Resource を使うため、追加のコストはかからない。
+"""
+
+import collections
+
+import simpy
+
+HISTOGRAM_BIN_WIDTH = 1  # 待ち時間・使用時間ヒストグラムの幅（分）
+
+
+class ResourceStats:
+    """リソースの利用状況の集計値"""
+    def __init__(self, name, capacity, start_time=0):
+        self.name = name
+        self.capacity = capacity
+        self.start_time = start_time
+        self.last_time = start_time
+        self.capacity_integral = 0.0  # スタッフ数の時間積分（人・分）
+        self.busy_integral = 0.0  # 稼働人数の時間積分（人・分）
+        self.queue_integral = 0.0  # 待ち行列の長さの時間積分（件・分）
+        self.max_queue_length = 0
+        self.requests = 0  # 割り当てが済んだ要求の数
+        self.completed = 0  # 解放が済んだ要求の数
+        self.total_wait = 0.0
+        self.total_hold = 0.0
+        self.wait_histogram = collections.Counter()
+        self.hold_histogram = collections.Counter()
+
+    def elapsed(self):
+        """集計期間の長さ（分）"""
+        return self.last_time - self.start_time
+
+    def utilization(self):
+        """平均稼働率"""
+        return self.busy_integral / self.capacity_integral if self.capacity_integral > 0 else 0
+
+    def average_queue_length(self):
+        """時間平均の待ち行列の長さ"""
+        return self.queue_integral / self.elapsed() if self.elapsed() > 0 else 0
+
+    def average_wait(self):
+        """1要求あたりの平均待ち時間（分）"""
+        return self.total_wait / self.requests if self.requests else 0
+
+    def average_hold(self):
+        """1要求あたりの平均使用時間（分）"""
+        return self.total_hold / self.completed if self.completed else 0
+
+    def wait_quantile(self, q):
+        """待ち時間の分位点（ヒストグラムのビン上端、分）"""
+        return histogram_quantile(self.wait_histogram, q)
+
+
+def histogram_quantile(histogram, q):
+    """ヒストグラムから分位点を取得"""
+    total = sum(histogram.values())
+    if total == 0:
+        return 0
+    threshold = q * total
+    cumulative = 0
+    for bin_index in sorted(histogram):
+        cumulative += histogram[bin_index]
+        if cumulative >= threshold:
+            return (bin_index + 1) * HISTOGRAM_BIN_WIDTH
+    return (max(histogram) + 1) * HISTOGRAM_BIN_WIDTH
+
+
+def add_hourly(hourly, start, end, rate):
+    """[start, end) の区間で rate を時間積分した値を時間帯ごとに加算"""
+    while start < end:
+        hour = int(start / 60)
+        boundary = min(end, (hour + 1) * 60)
+        hourly[hour] += rate * (boundary - start)
+        start = boundary
+
+
+class MonitoredResource(simpy.Resource):
+    """利用状況を記録するリソース
+
+    集計値は stats（ResourceStats）に、時間帯別の値は hourly_metrics の
+    "<名前>_capacity"（スタッフ数の積分）、"<名前>_busy"（稼働人数の積分）、
+    "<名前>_queue"（待ち行列の積分）、"<名前>_wait"（待ち時間の合計）、
+    "<名前>_requests"（要求数）に記録する。
+    """
+    def __init__(self, env, capacity, stats, hourly_metrics):
+        super().__init__(env, capacity=capacity)
+        self.stats = stats
+        self.hourly_capacity = hourly_metrics.setdefault(f"{stats.name}_capacity", collections.defaultdict(float))
+        self.hourly_busy = hourly_metrics.setdefault(f"{stats.name}_busy", collections.defaultdict(float))
+        self.hourly_queue = hourly_metrics.setdefault(f"{stats.name}_queue", collections.defaultdict(float))
+        self.hourly_wait = hourly_metrics.setdefault(f"{stats.name}_wait", collections.defaultdict(float))
+        self.hourly_requests = hourly_metrics.setdefault(f"{stats.name}_requests", collections.defaultdict(int))
+
+    def update(self):
+        """前回の更新から現在までの稼働人数・待ち行列の長さを積分"""
+        now = self._env.now
+        stats = self.stats
+        if now > stats.last_time:
+            busy = len(self.users)
+            queued = len(self.queue)
+            stats.capacity_integral += self.capacity * (now - stats.last_time)
+            stats.busy_integral += busy * (now - stats.last_time)
+            stats.queue_integral += queued * (now - stats.last_time)
+            add_hourly(self.hourly_capacity, stats.last_time, now, self.capacity)
+            if busy:
+                add_hourly(self.hourly_busy, stats.last_time, now, busy)
+            if queued:
+                add_hourly(self.hourly_queue, stats.last_time, now, queued)
+            stats.last_time = now
+
+    def request(self, requested_at=None, granted_at=None):
+        """リソースを要求
+
+        スナップショットから再開した要求は、元の要求時刻 requested_at と
+        割り当て時刻 granted_at を引き継ぐ（割り当て済みなら待ち時間は記録し直さない）。
+        """
+        self.update()
+        req = super().request()
+        req.requested_at = requested_at if requested_at is not None else self._env.now
+        req.granted_at = granted_at
+        if granted_at is None:
+            req.callbacks.insert(0, self._record_grant)
+        self.stats.max_queue_length = max(self.stats.max_queue_length, len(self.queue))
+        return req
+
+    def release(self, request):
+        """リソースを解放"""
+        self.update()
+        if getattr(request, "granted_at", None) is not None:
+            hold = self._env.now - request.granted_at
+            self.stats.completed += 1
+            self.stats.total_hold += hold
+            self.stats.hold_histogram[int(hold // HISTOGRAM_BIN_WIDTH)] += 1
+        return super().release(request)
+
+    def record_outside_hold(self, start, granted_at):
+        """リソースの外で終えた作業（定員を減らす前から作業中だった分）を記録
+
+        start から現在までの稼働時間と、granted_at からの使用時間を集計に加える。
+        この間は定員を超えて稼働するため、稼働人数が定員を上回ることがある。
+        """
+        now = self._env.now
+        self.update()
+        if now > start:
+            self.stats.busy_integral += now - start
+            add_hourly(self.hourly_busy, start, now, 1)
+        hold = now - granted_at
+        self.stats.completed += 1
+        self.stats.total_hold += hold
+        self.stats.hold_histogram[int(hold // HISTOGRAM_BIN_WIDTH)] += 1
+
+    def _record_grant(self, request):
+        """要求が割り当てられた時点で待ち時間を記録"""
+        now = self._env.now
+        request.granted_at = now
+        wait = now - request.requested_at
+        self.stats.requests += 1
+        self.stats.total_wait += wait
+        self.stats.wait_histogram[int(wait // HISTOGRAM_BIN_WIDTH)] += 1
+        self.hourly_wait[int(now / 60)] += wait
+        self.hourly_requests[int(now / 60)] += 1
+
+
+def create_resource(env, name, capacity, metrics, monitored):
+    """スタッフのリソースを作成（monitored が False なら通常の simpy.Resource）
+
+    metrics に同名の集計値がある場合（スナップショットからの再開）はそれを引き継ぐ。
+    """
+    if not monitored:
+        return simpy.Resource(env, capacity=capacity)
+    stats = metrics.resource_stats.get(name)
+    if stats is None:
+        stats = ResourceStats(name, capacity, start_time=env.now)
+        metrics.resource_stats[name] = stats
+    stats.capacity = capacity
+    stats.last_time = env.now
+    return MonitoredResource(env, capacity, stats, metrics.hourly_metrics)
+
+
+def request_resource(resource, requested_at=None, granted_at=None):
+    """リソースを要求（モニタリング中なら元の要求時刻・割り当て時刻を引き継ぐ）"""
+    if isinstance(resource, MonitoredResource):
+        return resource.request(requested_at, granted_at)
+    return resource.request()
+
+
+def record_outside_hold(resource, start, granted_at):
+    """リソースの外で終えた作業を記録（モニタリング中のみ）"""
+    if isinstance(resource, MonitoredResource):
+        resource.record_outside_hold(start, granted_at)
+
+
+def update_resources(*resources):
+    """モニタリング中のリソースの積分を現在時刻まで進める"""
+    for resource in resources:
+        if isinstance(resource, MonitoredResource):
+            resource.update()
+
+
+def format_resource_stats(stats):
+    """利用状況の集計値を表示用の文字列に変換"""
+    return (
+        f"稼働率 {stats.utilization() * 100:.1f}%, "
+        f"平均待ち行列 {stats.average_queue_length():.2f}件 (最大 {stats.max_queue_length}件), "
+        f"平均待ち時間 {stats.average_wait():.1f}分 (95%点 {stats.wait_quantile(0.95)}分), "
+        f"平均使用時間 {stats.average_hold():.1f}分, 要求数 {stats.requests}件"
+    )
+
+
+def hourly_utilization(hourly_metrics, name):
+    """時間帯別の稼働率を計算"""
+    capacity = hourly_metrics.get(f"{name}_capacity", {})
+    busy = hourly_metrics.get(f"{name}_busy", {})
+    return {hour: busy.get(hour, 0) / value for hour, value in capacity.items() if value > 0}
@@ -7,10 +7,15 @@ import random
 from datetime import datetime, timedelta
 import collections
 
+from resource_monitor import (
+    create_resource, request_resource, record_outside_hold, update_resources, format_resource_stats, hourly_utilization
+)
+
 # シミュレーションパラメータをインポート
 from simulation_parameters import (
     EPSILON, SEATS, OPENING_HOUR, CLOSING_HOUR, KITCHEN_STAFF, HALL_STAFF,
-    MENU, INGREDIENTS, CUSTOMER_PARAMS, WEATHER_FACTORS
+    MONITOR_RESOURCES, MENU, INGREDIENTS, CUSTOMER_PARAMS, PATIENCE_RANGE, EATING_TIME_RANGE,
+    CHECKOUT_TIME_RANGE, QUEUE_ARRIVAL_DECAY, MIN_QUEUE_ARRIVAL_FACTOR, WEATHER_FACTORS
 )
 
 class Ingredient:
@@ -43,6 +48,10 @@ class Menu:
         """料理の価格を取得"""
         return self.items[item_name]["price"]
     
+    def get_order_weight(self, item_name):
+        """料理の注文されやすさ（相対値）を取得"""
+        return self.items[item_name].get("order_weight", 1.0)
+    
     def get_cooking_time(self, item_name):
         """料理の調理時間を取得（分布からサンプリング）"""
         mean = self.items[item_name]["cooking_time_mean"]
@@ -78,14 +87,26 @@ class Customer:
         self.orders = []
         self.is_seated = False
         self.walked_out = False
+        
+        # 行動の進行状況（スナップショットからの再開に使用）
+        self.phase = None  # 現在の段階（waiting, ordering, kitchen_queue, cooking, eating, checkout_queue, checkout）
+        self.patience_end = None  # 忍耐が尽きる時刻
+        self.wake_time = None  # 待機中の timeout が終わる時刻
+        self.requested_at = None  # スタッフを要求した時刻
+        self.granted_at = None  # スタッフが割り当てられた時刻
     
     def decide_orders(self, menu, available_items):
         """注文を決定"""
-        # 簡易的な実装: 各人がランダムに1品注文
+        # 簡易的な実装: 各人が注文されやすさに応じてランダムに1品注文
         possible_orders = []
+        if not available_items:
+            return possible_orders
+        weights = [menu.get_order_weight(item) for item in available_items]
+        if sum(weights) <= 0:
+            # 注文できるメニューの注文されやすさが全て 0 の場合は均等に選ぶ
+            weights = None
         for _ in range(self.group_size):
-            if available_items:
-                possible_orders.append(random.choice(available_items))
+            possible_orders.append(random.choices(available_items, weights=weights)[0])
         return possible_orders
 
 class SimulationMetrics:
@@ -106,6 +127,7 @@ class SimulationMetrics:
             "customers": collections.defaultdict(int),
             "walkouts": collections.defaultdict(int)
         }
+        self.resource_stats = {}  # スタッフの稼働状況（モニタリング有効時のみ）
     
     def record_arrival(self, customer, time, queue_length):
         """顧客到着を記録"""
@@ -115,6 +137,10 @@ class SimulationMetrics:
         hour = int(time / 60)
         self.hourly_metrics["customers"][hour] += 1
     
+    def record_queue_length(self, time, queue_length):
+        """待ち行列の長さの変化（着席・退出）を記録"""
+        self.queue_length_over_time.append((time, queue_length))
+    
     def record_seating(self, customer, time, seated_count):
         """着席を記録"""
         self.seated_customers_over_time.append((time, seated_count))
@@ -212,20 +238,33 @@ class SimulationMetrics:
 
 class Restaurant:
     """レストランクラス"""
-    def __init__(self, env, seats, menu_items, ingredients_data, opening_hour, closing_hour, kitchen_staff, hall_staff):
+    def __init__(self, env, seats, menu_items, ingredients_data, opening_hour, closing_hour, kitchen_staff, hall_staff,
+                 patience_range=PATIENCE_RANGE, eating_time_range=EATING_TIME_RANGE, days=1,
+                 monitor_resources=MONITOR_RESOURCES, metrics=None):
         self.env = env
         self.seats = seats
         self.available_seats = seats
         self.waiting_line = []
         self.seated_customers = []
+        self.queue_watch = None  # (待ち行列の長さ, 到達時に発火するイベント)
         
         # 営業時間（分単位）
         self.opening_time = opening_hour * 60
         self.closing_time = closing_hour * 60
+        self.days = days
+        self.last_closing_time = (days - 1) * 24 * 60 + self.closing_time  # 最終日の閉店時刻
+        
+        # 顧客の忍耐度・食事時間の範囲（分）
+        self.patience_range = patience_range
+        self.eating_time_range = eating_time_range
         
-        # スタッフ
-        self.kitchen_staff = simpy.Resource(env, capacity=kitchen_staff)
-        self.hall_staff = simpy.Resource(env, capacity=hall_staff)
+        # 指標（スナップショットから再開する場合は途中までの指標を引き継ぐ）
+        self.metrics = metrics if metrics is not None else SimulationMetrics()
+        
+        # スタッフ（モニタリング有効時は稼働状況を記録するリソース）
+        self.monitor_resources = monitor_resources
+        self.kitchen_staff = create_resource(env, "kitchen_staff", kitchen_staff, self.metrics, monitor_resources)
+        self.hall_staff = create_resource(env, "hall_staff", hall_staff, self.metrics, monitor_resources)
         
         # メニューと材料
         self.ingredients = {
@@ -233,13 +272,10 @@ class Restaurant:
             for name, data in ingredients_data.items()
         }
         self.menu = Menu(menu_items)
-        
-        # 指標
-        self.metrics = SimulationMetrics()
     
     def is_open(self, time):
         """営業中かどうか確認"""
-        return self.opening_time <= time < self.closing_time
+        return self.opening_time <= time % (24 * 60) < self.closing_time and time < self.last_closing_time
     
     def can_prepare(self, item_name):
         """料理が作れるか確認（材料の在庫チェック）"""
@@ -262,9 +298,31 @@ class Restaurant:
             self.seated_customers.append(customer)
             self.waiting_line.remove(customer)
             self.metrics.record_seating(customer, self.env.now, len(self.seated_customers))
+            self.metrics.record_queue_length(self.env.now, len(self.waiting_line))
             return True
         return False
     
+    def watch_queue_length(self, level):
+        """待ち行列の長さが level 以上になった時点で発火するイベントを返す"""
+        event = self.env.event()
+        if len(self.waiting_line) >= level:
+            event.succeed()
+        else:
+            self.queue_watch = (level, event)
+        return event
+    
+    def check_queue_watch(self):
+        """待ち行列の長さが監視中の水準に達したか確認"""
+        if self.queue_watch is not None and len(self.waiting_line) >= self.queue_watch[0]:
+            self.queue_watch[1].succeed()
+            self.queue_watch = None
+    
+    def leave_waiting_line(self, customer):
+        """待ちきれずに帰った顧客を待ち行列から外す"""
+        self.waiting_line.remove(customer)
+        self.metrics.record_queue_length(self.env.now, len(self.waiting_line))
+        self.metrics.record_walkout(customer, self.env.now)
+    
     def release_seating(self, customer):
         """席を解放"""
         self.available_seats += customer.group_size
@@ -282,83 +340,129 @@ def customer_behavior(env, customer, restaurant):
     customer.arrival_time = env.now
     restaurant.waiting_line.append(customer)
     restaurant.metrics.record_arrival(customer, env.now, len(restaurant.waiting_line))
+    restaurant.check_queue_watch()
     
     # 席が空くか、忍耐が尽きるまで待機
-    patience_end = env.now + customer.patience
+    customer.patience_end = env.now + customer.patience
+    customer.phase = "waiting"
     
-    while env.now < patience_end and not customer.is_seated:
-        # 席が空いているか確認
-        if restaurant.seat_customer(customer):
-            break
-        
-        # 1分待機
-        yield env.timeout(1)
+    yield from continue_customer_behavior(env, customer, restaurant)
+
+def continue_customer_behavior(env, customer, restaurant):
+    """顧客の行動を customer.phase の段階から続けるプロセス
+    
+    到着直後のほか、スナップショットから復元した顧客の再開にも使う。
+    各段階の待機は customer.wake_time まで行う。
+    """
+    if customer.phase == "waiting":
+        while env.now < customer.patience_end and not customer.is_seated:
+            if customer.wake_time is None:
+                # 席が空いているか確認
+                if restaurant.seat_customer(customer):
+                    break
+                customer.wake_time = env.now + 1
+            
+            # 1分待機
+            yield env.timeout(max(0, customer.wake_time - env.now))
+            customer.wake_time = None
+            
+            # 忍耐が尽きた場合
+            if env.now >= customer.patience_end and not customer.is_seated:
+                restaurant.leave_waiting_line(customer)
+                return
         
-        # 忍耐が尽きた場合
-        if env.now >= patience_end and not customer.is_seated:
-            restaurant.metrics.record_walkout(customer, env.now)
+        # 着席できなかった場合
+        if not customer.is_seated:
             return
+        
+        # 注文
+        customer.phase = "ordering"
+        customer.wake_time = env.now + random.uniform(2, 5)  # メニュー検討時間
     
-    # 着席できなかった場合
-    if not customer.is_seated:
-        return
-    
-    # 注文
-    yield env.timeout(random.uniform(2, 5))  # メニュー検討時間
-    
-    # 注文可能なメニューを確認
-    available_items = restaurant.menu.get_available_items(restaurant.ingredients)
-    customer.orders = customer.decide_orders(restaurant.menu, available_items)
-    
-    # 注文がない場合（全て品切れなど）
-    if not customer.orders:
-        customer.departure_time = env.now
-        restaurant.metrics.record_departure(customer, env.now)
-        restaurant.release_seating(customer)
-        return
-    
-    # 注文した料理の材料を使用
-    for item in customer.orders:
-        restaurant.reserve_ingredients(item)
-    
-    # 調理（キッチンスタッフを確保）
-    with restaurant.kitchen_staff.request() as req:
-        yield req
+    if customer.phase == "ordering":
+        yield env.timeout(max(0, customer.wake_time - env.now))
         
-        # 各料理の調理時間を計算
-        cooking_times = []
+        # 注文可能なメニューを確認
+        available_items = restaurant.menu.get_available_items(restaurant.ingredients)
+        customer.orders = customer.decide_orders(restaurant.menu, available_items)
+        
+        # 注文がない場合（全て品切れなど）
+        if not customer.orders:
+            customer.departure_time = env.now
+            restaurant.metrics.record_departure(customer, env.now)
+            restaurant.release_seating(customer)
+            return
+        
+        # 注文した料理の材料を使用
         for item in customer.orders:
-            cooking_time = restaurant.cook(item)
-            cooking_times.append(cooking_time)
+            restaurant.reserve_ingredients(item)
         
-        # 最も時間のかかる料理ができるまで待機
-        if cooking_times:
-            yield env.timeout(max(cooking_times))
+        customer.phase = "kitchen_queue"
     
-    # 食事
-    eating_time = random.uniform(15, 30)  # 食事時間（15〜30分）
-    yield env.timeout(eating_time)
-    
-    # 会計と退店
-    with restaurant.hall_staff.request() as req:
-        yield req
-        yield env.timeout(random.uniform(3, 5))  # 会計処理時間
+    if customer.phase in ("kitchen_queue", "cooking"):
+        # 調理（キッチンスタッフを確保）
+        # 最も時間のかかる料理ができるまで待機
+        yield from use_staff(
+            env, restaurant.kitchen_staff, customer, "cooking",
+            lambda: max(restaurant.cook(item) for item in customer.orders)
+        )
+        
+        # 食事
+        customer.phase = "eating"
+        customer.wake_time = env.now + random.uniform(*restaurant.eating_time_range)  # 食事時間
+    
+    if customer.phase == "eating":
+        yield env.timeout(max(0, customer.wake_time - env.now))
+        customer.phase = "checkout_queue"
+    
+    if customer.phase in ("checkout_queue", "checkout"):
+        # 会計と退店
+        yield from use_staff(
+            env, restaurant.hall_staff, customer, "checkout",
+            lambda: random.uniform(*CHECKOUT_TIME_RANGE)  # 会計処理時間
+        )
     
     # 売上記録
     bill = sum(restaurant.menu.get_price(item) for item in customer.orders)
     restaurant.metrics.record_revenue(bill, env.now)
     
     # 退店
+    customer.phase = None
     customer.departure_time = env.now
     restaurant.metrics.record_departure(customer, env.now)
     restaurant.release_seating(customer)
 
+def use_staff(env, staff, customer, busy_phase, service_time):
+    """スタッフを確保し、service_time() で決まる時間だけ作業してもらう
+    
+    割り当て後は customer.phase を busy_phase にする。スナップショットから再開した
+    場合は、元の要求時刻・割り当て時刻と作業終了時刻を引き継ぐ。
+    """
+    if customer.requested_at is None:
+        customer.requested_at = env.now
+    if customer.granted_at is not None and len(staff.users) >= staff.capacity:
+        # スタッフを減らして再開した場合、定員を超えた作業中の分は減らしたスタッフが
+        # そのまま終える（新しい割り当てには減らした後の人数を使う）
+        start = env.now
+        yield env.timeout(max(0, customer.wake_time - env.now))
+        record_outside_hold(staff, start, customer.granted_at)
+    else:
+        with request_resource(staff, customer.requested_at, customer.granted_at) as req:
+            yield req
+            if customer.granted_at is None:
+                customer.granted_at = env.now
+                customer.phase = busy_phase
+                customer.wake_time = env.now + service_time()
+            yield env.timeout(max(0, customer.wake_time - env.now))
+    customer.requested_at = None
+    customer.granted_at = None
+
 def customer_generator(env, restaurant, customer_params, weather_schedule):
     """顧客を生成するプロセス"""
     while True:
         # 営業時間外なら顧客生成を停止
         if not restaurant.is_open(env.now):
-            if env.now >= restaurant.closing_time:
+            if env.now >= restaurant.last_closing_time:
                 break
             else:
                 yield env.timeout(1)
@@ -366,7 +470,7 @@ def customer_generator(env, restaurant, customer_params, weather_schedule):
         
         # 現在の時間帯を判定
         current_hour = int(env.now / 60)
-        time_of_day = "lunch" if 11 <= current_hour < 15 else "dinner"
+        time_of_day = "lunch" if 11 <= current_hour % 24 < 15 else "dinner"
         
         # 曜日を判定（簡易的に平日/週末）
         day_type = "weekend" if current_hour // 24 % 7 >= 5 else "weekday"
@@ -377,7 +481,7 @@ def customer_generator(env, restaurant, customer_params, weather_schedule):
         
         # 待ち行列の長さによる影響
         queue_length = len(restaurant.waiting_line)
-        queue_factor = max(0.1, 1 - queue_length * 0.05)  # 待ち行列が長いほど来客が減少
+        queue_factor = max(MIN_QUEUE_ARRIVAL_FACTOR, 1 - queue_length * QUEUE_ARRIVAL_DECAY)  # 待ち行列が長いほど来客が減少
         
         # 次の顧客の到着間隔を計算
         params = customer_params[day_type][time_of_day]
@@ -396,8 +500,8 @@ def customer_generator(env, restaurant, customer_params, weather_schedule):
             p=params["group_size_probs"]
         )
         
-        # 忍耐度を決定（10〜30分）
-        patience = random.uniform(10, 30)
+        # 忍耐度を決定
+        patience = random.uniform(*restaurant.patience_range)
         
         # 顧客を生成
         customer = Customer(env, group_size, patience)
@@ -437,6 +541,16 @@ def analyze_results(metrics):
     print(f"平均待ち時間: {metrics.avg_waiting_time:.1f}分")
     print(f"平均食事時間: {metrics.avg_dining_time:.1f}分")
     
+    # スタッフ稼働状況（モニタリング有効時のみ）
+    if metrics.resource_stats:
+        print("\n【スタッフ稼働状況】")
+        for name, stats in metrics.resource_stats.items():
+            print(f"  {name}: {format_resource_stats(stats)}")
+            utilization = hourly_utilization(metrics.hourly_metrics, name)
+            print("    時間帯別稼働率: " + ", ".join(
+                f"{hour}時 {rate * 100:.0f}%" for hour, rate in sorted(utilization.items()) if rate > 0
+            ))
+    
     # 在庫管理
     print("\n【在庫管理】")
     print(f"品切れ回数: {sum(metrics.stockouts.values())}回")
@@ -533,43 +647,74 @@ def plot_ingredient_usage(metrics):
     plt.close()
 
 
-def main():
-    """メイン関数"""
-    # 天候スケジュール（日ごと）
-    weather_schedule = {
-        0: "sunny",  # 1日目
-    }
+def finalize_metrics(restaurant):
+    """営業終了後の材料使用状況とコストを記録し、指標を計算"""
+    # スタッフ稼働状況の積分を終了時刻まで進める
+    update_resources(restaurant.kitchen_staff, restaurant.hall_staff)
     
-    # シミュレーション環境の設定
-    env = simpy.Environment()
+    # 材料使用状況を記録
+    restaurant.metrics.record_ingredient_usage(restaurant.ingredients)
+    
+    # 材料コストを計算 - 初期在庫（購入した全材料）のコストを記録
+    for ing in restaurant.ingredients.values():
+        restaurant.metrics.record_cost(ing.initial_stock * ing.cost)
+    
+    restaurant.metrics.calculate_metrics()
+    return restaurant.metrics
+
+def build_simulation(seats=SEATS, kitchen_staff=KITCHEN_STAFF, hall_staff=HALL_STAFF,
+                     menu_items=MENU, ingredients_data=INGREDIENTS, customer_params=CUSTOMER_PARAMS,
+                     weather_schedule=None, patience_range=PATIENCE_RANGE,
+                     eating_time_range=EATING_TIME_RANGE, opening_hour=OPENING_HOUR,
+                     closing_hour=CLOSING_HOUR, days=1, monitor_resources=MONITOR_RESOURCES, seed=None):
+    """シミュレーション環境とレストランを作成し、顧客生成プロセスを開始する
+    
+    seed を指定すると random と numpy の乱数を初期化し、結果を再現できる。
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
     
-    # レストランの初期化
+    env = simpy.Environment()
     restaurant = Restaurant(
         env=env,
-        seats=SEATS,
-        menu_items=MENU,
-        ingredients_data=INGREDIENTS,
-        opening_hour=OPENING_HOUR,
-        closing_hour=CLOSING_HOUR,
-        kitchen_staff=KITCHEN_STAFF,
-        hall_staff=HALL_STAFF
+        seats=seats,
+        menu_items=menu_items,
+        ingredients_data=ingredients_data,
+        opening_hour=opening_hour,
+        closing_hour=closing_hour,
+        kitchen_staff=kitchen_staff,
+        hall_staff=hall_staff,
+        patience_range=patience_range,
+        eating_time_range=eating_time_range,
+        days=days,
+        monitor_resources=monitor_resources
     )
+    env.process(customer_generator(env, restaurant, customer_params, weather_schedule or {0: "sunny"}))
+    return env, restaurant
+
+def run_simulation(until=None, **kwargs):
+    """シミュレーションを1回実行して指標を返す（結果表示・グラフ出力なし）
     
-    # 顧客生成プロセスの開始
-    env.process(customer_generator(env, restaurant, CUSTOMER_PARAMS, weather_schedule))
-    
-    # シミュレーション実行（1日分）
-    env.run(until=24*60)  # 24時間（分単位）
+    引数は build_simulation と同じ。until を省略すると days 日分を実行する。
+    """
+    env, restaurant = build_simulation(**kwargs)
+    env.run(until=until if until is not None else kwargs.get("days", 1) * 24 * 60)
     
-    # 材料使用状況を記録
-    restaurant.metrics.record_ingredient_usage(restaurant.ingredients)
+    return finalize_metrics(restaurant)
+
+def main():
+    """メイン関数"""
+    # 天候スケジュール（日ごと）
+    weather_schedule = {
+        0: "sunny",  # 1日目
+    }
     
-    # 材料コストを計算 - 初期在庫（購入した全材料）のコストを記録
-    for ing in restaurant.ingredients.values():
-        restaurant.metrics.record_cost(ing.initial_stock * ing.cost)
+    # シミュレーション実行（1日分）
+    metrics = run_simulation(weather_schedule=weather_schedule)
     
     # 結果の分析
-    analyze_results(restaurant.metrics)
+    analyze_results(metrics)
     
     print("\nシミュレーション完了！グラフは以下のファイルに保存されました：")
     print("- hourly_metrics.png")
@@ -0,0 +1,184 @@
+"""
+逐次的な反復回数配分によるシナリオ比較（OCBA）
+
+各シナリオを少数回ずつ実行した後、OCBA（Optimal Computing Budget Allocation）に従って
+最良シナリオと僅差のシナリオに多くの反復を割り当て、最良シナリオを正しく選ぶ確率
+（近似PCS）が指定値に達した時点で終了する。
+比較のため、同じ停止規則と同じ乱数列で、反復を均等に配分した場合の反復回数も計算できる。
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import norm
+
+from example_scenarios import SCENARIOS, scenario_parameters
+from restaurant_simulation import EPSILON, run_simulation
+
+DEFAULT_INITIAL_RUNS = 10  # 各シナリオの初期反復回数
+DEFAULT_RUNS_PER_STAGE = 10  # 1段階で追加する反復回数
+DEFAULT_MAX_RUNS = 2000  # 全シナリオ合計の反復回数の上限
+
+
+def replication_seed(seed, scenario_index, replication):
+    """シナリオと反復番号ごとに独立な乱数シードを作成"""
+    return int(np.random.SeedSequence([seed, scenario_index, replication]).generate_state(1)[0])
+
+
+def simulate_replication(task):
+    """1回分のシミュレーションを実行し、目的指標の値を返す（ワーカーで呼ばれる）"""
+    kwargs, seed, objective = task
+    metrics = run_simulation(seed=seed, **scenario_parameters(**kwargs))
+    return getattr(metrics, objective)
+
+
+def approximate_pcs(means, variances, counts, best, indifference_zone=0.0):
+    """最良シナリオを正しく選ぶ確率の下限（Bonferroni近似）を計算
+
+    means は大きいほど良い向きに揃えた平均値。
+    """
+    others = np.arange(means.size) != best
+    delta = np.maximum(means[best] - means[others], indifference_zone)
+    std_error = np.sqrt(variances[best] / counts[best] + variances[others] / counts[others])
+    return 1 - np.sum(norm.cdf(-delta / np.maximum(std_error, EPSILON)))
+
+
+def ocba_allocation(means, variances, total, best):
+    """OCBAによる総反復回数 total の理想的な配分を計算"""
+    std = np.sqrt(np.maximum(variances, EPSILON))
+    others = np.arange(means.size) != best
+    delta = np.maximum(means[best] - means, EPSILON)
+
+    # 最良以外: N_i ∝ (σ_i / δ_i)^2、最良: N_b = σ_b * sqrt(Σ N_i^2 / σ_i^2)
+    ratios = np.zeros(means.size)
+    ratios[others] = (std[others] / delta[others]) ** 2
+    ratios[best] = std[best] * np.sqrt(np.sum(ratios[others] ** 2 / std[others] ** 2))
+    return total * ratios / ratios.sum()
+
+
+def allocate_stage(means, variances, counts, best, runs_per_stage):
+    """次の段階で各シナリオに追加する反復回数を決定"""
+    target = ocba_allocation(means, variances, counts.sum() + runs_per_stage, best)
+    shortfall = np.maximum(target - counts, 0)
+    if shortfall.sum() <= 0:
+        shortfall = np.ones(means.size)
+    additions = np.floor(runs_per_stage * shortfall / shortfall.sum()).astype(int)
+    # 端数は不足分の大きい順に配る
+    for i in np.argsort(-shortfall)[:runs_per_stage - additions.sum()]:
+        additions[i] += 1
+    return additions
+
+
+def equal_allocation(counts, runs_per_stage):
+    """次の段階で各シナリオに追加する反復回数を均等に決定（端数は反復回数の少ない順に配る）"""
+    additions = np.full(counts.size, runs_per_stage // counts.size)
+    for i in np.argsort(counts, kind="stable")[:runs_per_stage - additions.sum()]:
+        additions[i] += 1
+    return additions
+
+
+def select_best_scenario(scenarios=SCENARIOS, objective="total_profit", maximize=True,
+                         target_pcs=0.95, indifference_zone=0.0, initial_runs=DEFAULT_INITIAL_RUNS,
+                         runs_per_stage=DEFAULT_RUNS_PER_STAGE, max_runs=DEFAULT_MAX_RUNS,
+                         allocation="ocba", seed=0, workers=None):
+    """反復回数を逐次配分し、最良シナリオを選択
+
+    allocation が "ocba" なら OCBA で、"equal" なら均等に配分する。停止規則と
+    シナリオ・反復番号ごとの乱数シードは共通なので、同じ seed で両者の反復回数を比較できる。
+    indifference_zone より小さい差は実質的に同等とみなす。
+    戻り値は結果をまとめた辞書。
+    """
+    if allocation not in ("ocba", "equal"):
+        raise ValueError(f"未対応の配分方法です: {allocation}")
+    k = len(scenarios)
+    samples = [[] for _ in range(k)]
+    sign = 1.0 if maximize else -1.0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def run(additions):
+            tasks = []
+            owners = []
+            for i, count in enumerate(additions):
+                start = len(samples[i])
+                for r in range(start, start + count):
+                    tasks.append((scenarios[i][1], replication_seed(seed, i, r), objective))
+                    owners.append(i)
+            for i, value in zip(owners, executor.map(simulate_replication, tasks)):
+                samples[i].append(sign * value)
+
+        run([initial_runs] * k)
+        while True:
+            counts = np.array([len(s) for s in samples])
+            means = np.array([np.mean(s) for s in samples])
+            variances = np.array([np.var(s, ddof=1) for s in samples])
+            best = int(np.argmax(means))
+            pcs = approximate_pcs(means, variances, counts, best, indifference_zone)
+            if pcs >= target_pcs or counts.sum() >= max_runs:
+                break
+            budget = min(runs_per_stage, max_runs - counts.sum())
+            if allocation == "ocba":
+                run(allocate_stage(means, variances, counts, best, budget))
+            else:
+                run(equal_allocation(counts, budget))
+
+    return {
+        "best": best,
+        "names": [name for name, _ in scenarios],
+        "means": sign * means,
+        "stds": np.sqrt(variances),
+        "counts": counts,
+        "pcs": pcs,
+        "total_runs": int(counts.sum()),
+        "allocation": allocation,
+    }
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="OCBAによるシナリオ比較")
+    parser.add_argument("--objective", default="total_profit", help="比較する指標（SimulationMetrics の属性名）")
+    parser.add_argument("--minimize", action="store_true", help="指標が小さいほど良い場合に指定")
+    parser.add_argument("--target-pcs", type=float, default=0.95, help="最良シナリオを正しく選ぶ確率の目標値")
+    parser.add_argument("--indifference-zone", type=float, default=0.0, help="同等とみなす差の大きさ")
+    parser.add_argument("--initial-runs", type=int, default=DEFAULT_INITIAL_RUNS, help="各シナリオの初期反復回数")
+    parser.add_argument("--runs-per-stage", type=int, default=DEFAULT_RUNS_PER_STAGE, help="1段階で追加する反復回数")
+    parser.add_argument("--max-runs", type=int, default=DEFAULT_MAX_RUNS, help="合計反復回数の上限")
+    parser.add_argument("--skip-equal", action="store_true", help="均等配分との比較を省略")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数")
+    args = parser.parse_args()
+
+    options = dict(
+        objective=args.objective, maximize=not args.minimize, target_pcs=args.target_pcs,
+        indifference_zone=args.indifference_zone, initial_runs=args.initial_runs,
+        runs_per_stage=args.runs_per_stage, max_runs=args.max_runs,
+        seed=args.seed, workers=args.workers
+    )
+    result = select_best_scenario(allocation="ocba", **options)
+
+    print("\n===== シナリオ比較（OCBA） =====")
+    print(f"比較指標: {args.objective}（{'小さい' if args.minimize else '大きい'}ほど良い）")
+    for i, name in enumerate(result["names"]):
+        mark = " ← 最良" if i == result["best"] else ""
+        print(f"  {name}: 平均 {result['means'][i]:.6g}, 標準偏差 {result['stds'][i]:.6g}, "
+              f"反復 {result['counts'][i]}回{mark}")
+    print(f"\n正しく選べる確率（近似）: {result['pcs'] * 100:.1f}%")
+    print(f"使用した反復回数: {result['total_runs']}回")
+    if args.skip_equal:
+        return
+
+    # 同じ停止規則・同じ乱数列で均等に配分した場合
+    equal = select_best_scenario(allocation="equal", **options)
+    print("\n均等配分（同じ停止規則・同じ乱数列）:")
+    print(f"  反復回数: {equal['total_runs']}回, 正しく選べる確率（近似）: {equal['pcs'] * 100:.1f}%, "
+          f"選んだシナリオ: {equal['names'][equal['best']]}")
+    saved = 1 - result["total_runs"] / equal["total_runs"]
+    change = f"{saved * 100:.1f}%削減" if saved >= 0 else f"{-saved * 100:.1f}%増加"
+    print(f"  OCBAの反復回数は均等配分より{change}")
+    if min(result["pcs"], equal["pcs"]) < args.target_pcs:
+        print("  ※反復回数の上限に達し、目標の確率に届いていない結果があります")
+
+
+if __name__ == "__main__":
+    main()
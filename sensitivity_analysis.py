@@ -0,0 +1,227 @@
+"""
+シミュレーションパラメータの大域的感度分析（Sobol指数）
+
+Sobol列による準乱数サンプルからSaltelliの方法で評価点を作り、
+プロセスプールでシミュレーションを並列実行して、キャンセル率や純利益に対する
+各パラメータの1次指数・全効果指数とそのブートストラップ信頼区間を計算する。
+"""
+
+import argparse
+import copy
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import qmc
+
+from restaurant_simulation import (
+    MENU, INGREDIENTS, CUSTOMER_PARAMS, run_simulation
+)
+
+# 感度分析の対象パラメータ: (名前, 下限, 上限, 整数かどうか)
+PARAMETER_SPACE = [
+    ("seats", 10, 30, True),  # 席数
+    ("kitchen_staff", 1, 4, True),  # 調理スタッフ数
+    ("hall_staff", 1, 5, True),  # ホールスタッフ数
+    ("interval_scale", 0.5, 2.0, False),  # 到着間隔の倍率
+    ("group_size_shift", -0.5, 0.5, False),  # グループサイズ分布の偏り（負: 少人数寄り, 正: 大人数寄り）
+    ("patience_min", 5, 20, False),  # 忍耐度の下限（分）
+    ("patience_width", 5, 30, False),  # 忍耐度の範囲の幅（分）
+    ("eating_min", 10, 25, False),  # 食事時間の下限（分）
+    ("eating_width", 5, 20, False),  # 食事時間の範囲の幅（分）
+    ("ingredient_multiplier", 0.5, 1.5, False),  # 材料の初期在庫の倍率
+]
+
+# 評価する出力指標
+OUTPUTS = ["walkout_rate", "total_profit", "avg_waiting_time"]
+
+DEFAULT_BATCH_SIZE = 16  # 1タスクでまとめて実行する評価点の数
+
+
+def scale_samples(unit_samples, space=PARAMETER_SPACE):
+    """[0, 1) の準乱数サンプルをパラメータの範囲に変換"""
+    scaled = np.empty_like(unit_samples, dtype=float)
+    for i, (_, low, high, is_integer) in enumerate(space):
+        if is_integer:
+            scaled[:, i] = np.minimum(np.floor(low + unit_samples[:, i] * (high - low + 1)), high)
+        else:
+            scaled[:, i] = low + unit_samples[:, i] * (high - low)
+    return scaled
+
+
+def shift_group_size_probs(probs, shift):
+    """グループサイズの確率を少人数側または大人数側に寄せる"""
+    extreme = [1.0, 0.0, 0.0, 0.0] if shift < 0 else [0.0, 0.0, 0.0, 1.0]
+    weight = abs(shift)
+    return [(1 - weight) * p + weight * e for p, e in zip(probs, extreme)]
+
+
+def build_simulation_kwargs(values, space=PARAMETER_SPACE):
+    """パラメータの値から run_simulation の引数を作成"""
+    params = {name: value for (name, *_), value in zip(space, values)}
+
+    customer_params = copy.deepcopy(CUSTOMER_PARAMS)
+    for day_params in customer_params.values():
+        for segment in day_params.values():
+            segment["mean_interval"] *= params["interval_scale"]
+            segment["group_size_probs"] = shift_group_size_probs(
+                segment["group_size_probs"], params["group_size_shift"]
+            )
+
+    ingredients = copy.deepcopy(INGREDIENTS)
+    for data in ingredients.values():
+        data["initial_stock"] = int(data["initial_stock"] * params["ingredient_multiplier"])
+
+    return {
+        "seats": int(params["seats"]),
+        "kitchen_staff": int(params["kitchen_staff"]),
+        "hall_staff": int(params["hall_staff"]),
+        "menu_items": MENU,
+        "ingredients_data": ingredients,
+        "customer_params": customer_params,
+        "patience_range": (params["patience_min"], params["patience_min"] + params["patience_width"]),
+        "eating_time_range": (params["eating_min"], params["eating_min"] + params["eating_width"]),
+    }
+
+
+def evaluate_batch(batch):
+    """評価点のバッチを実行（プロセスプールのワーカーで呼ばれる）
+
+    batch は (パラメータ値の配列, 乱数シード) のリスト。
+    """
+    results = []
+    for values, seed in batch:
+        metrics = run_simulation(seed=int(seed), **build_simulation_kwargs(values))
+        results.append([getattr(metrics, name) for name in OUTPUTS])
+    return results
+
+
+def saltelli_design(n_base, space=PARAMETER_SPACE, seed=None):
+    """Saltelliの方法で評価点を作成
+
+    戻り値は (A, B, AB) で、AB[i] は A の i 列目を B の i 列目で置き換えた行列。
+    n_base は Sobol列の性質を保つため2のべき乗に切り上げる。
+    """
+    d = len(space)
+    m = int(np.ceil(np.log2(max(2, n_base))))
+    sampler = qmc.Sobol(d=2 * d, scramble=True, seed=seed)
+    unit = sampler.random_base2(m=m)
+    A = scale_samples(unit[:, :d], space)
+    B = scale_samples(unit[:, d:], space)
+    AB = np.repeat(A[np.newaxis, :, :], d, axis=0)
+    for i in range(d):
+        AB[i, :, i] = B[:, i]
+    return A, B, AB
+
+
+def run_design(A, B, AB, seed=None, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """全評価点をプロセスプールで並列実行
+
+    同じ行の評価点（A[j], B[j], AB[i][j]）には同じ乱数シードを使い（共通乱数法）、
+    乱数のばらつきが指数の推定に混ざるのを抑える。
+    """
+    n = A.shape[0]
+    row_seeds = np.random.SeedSequence(seed).generate_state(n)
+    points = [A, B] + list(AB)
+    tasks = [(values, row_seeds[j]) for matrix in points for j, values in enumerate(matrix)]
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = [row for batch_result in executor.map(evaluate_batch, batches) for row in batch_result]
+
+    Y = np.asarray(results, dtype=float).reshape(len(points), n, len(OUTPUTS))
+    return Y[0], Y[1], Y[2:]
+
+
+def sobol_indices(fA, fB, fAB):
+    """1次指数と全効果指数を計算（Saltelli 2010 / Jansen の推定量）
+
+    fA, fB は長さ n、fAB は (d, n) の配列。
+    """
+    variance = np.var(np.concatenate([fA, fB]))
+    if variance <= 0:
+        d = fAB.shape[0]
+        return np.zeros(d), np.zeros(d)
+    first_order = np.mean(fB * (fAB - fA), axis=1) / variance
+    total = 0.5 * np.mean((fA - fAB) ** 2, axis=1) / variance
+    return first_order, total
+
+
+def bootstrap_indices(fA, fB, fAB, n_bootstrap=1000, confidence=0.95, seed=None):
+    """ブートストラップによる指数の信頼区間を計算"""
+    rng = np.random.default_rng(seed)
+    n = fA.size
+    first_samples = []
+    total_samples = []
+    for _ in range(n_bootstrap):
+        idx = rng.integers(0, n, size=n)
+        first_order, total = sobol_indices(fA[idx], fB[idx], fAB[:, idx])
+        first_samples.append(first_order)
+        total_samples.append(total)
+    alpha = (1 - confidence) / 2
+    first_ci = np.quantile(first_samples, [alpha, 1 - alpha], axis=0)
+    total_ci = np.quantile(total_samples, [alpha, 1 - alpha], axis=0)
+    return first_ci, total_ci
+
+
+def sensitivity_analysis(n_base=256, seed=None, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                         n_bootstrap=1000, confidence=0.95, space=PARAMETER_SPACE):
+    """Sobol感度分析を実行
+
+    評価回数は n_base × (パラメータ数 + 2)。
+    戻り値は出力指標ごとの {"S1", "S1_ci", "ST", "ST_ci"} の辞書と評価回数。
+    """
+    A, B, AB = saltelli_design(n_base, space, seed=seed)
+    YA, YB, YAB = run_design(A, B, AB, seed=seed, workers=workers, batch_size=batch_size)
+
+    results = {}
+    for k, output in enumerate(OUTPUTS):
+        fA, fB, fAB = YA[:, k], YB[:, k], YAB[:, :, k]
+        first_order, total = sobol_indices(fA, fB, fAB)
+        first_ci, total_ci = bootstrap_indices(
+            fA, fB, fAB, n_bootstrap=n_bootstrap, confidence=confidence, seed=seed
+        )
+        results[output] = {
+            "S1": first_order,
+            "S1_ci": first_ci,
+            "ST": total,
+            "ST_ci": total_ci,
+        }
+    n_evaluations = A.shape[0] * (len(space) + 2)
+    return results, n_evaluations
+
+
+def print_indices(results, space=PARAMETER_SPACE):
+    """感度指数を表示"""
+    for output, indices in results.items():
+        print(f"\n【{output}】")
+        print(f"{'パラメータ':<24}{'1次指数 S1':>24}{'全効果指数 ST':>24}")
+        order = np.argsort(-indices["ST"])
+        for i in order:
+            name = space[i][0]
+            s1 = f"{indices['S1'][i]:.3f} [{indices['S1_ci'][0][i]:.3f}, {indices['S1_ci'][1][i]:.3f}]"
+            st = f"{indices['ST'][i]:.3f} [{indices['ST_ci'][0][i]:.3f}, {indices['ST_ci'][1][i]:.3f}]"
+            print(f"{name:<24}{s1:>24}{st:>24}")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="シミュレーションパラメータのSobol感度分析")
+    parser.add_argument("--n-base", type=int, default=256, help="基本サンプル数（2のべき乗に切り上げ）")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1タスクあたりの評価点数")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="ブートストラップ回数")
+    args = parser.parse_args()
+
+    results, n_evaluations = sensitivity_analysis(
+        n_base=args.n_base, seed=args.seed, workers=args.workers,
+        batch_size=args.batch_size, n_bootstrap=args.bootstrap
+    )
+
+    print("\n===== Sobol感度分析結果 =====")
+    print(f"評価回数: {n_evaluations}回（括弧内は95%信頼区間）")
+    print_indices(results)
+
+
+if __name__ == "__main__":
+    main()
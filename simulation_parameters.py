@@ -11,11 +11,13 @@ OPENING_HOUR = 11  # 開店時間（時）
 CLOSING_HOUR = 22  # 閉店時間（時）
 KITCHEN_STAFF = 2  # 調理スタッフ数
 HALL_STAFF = 3  # ホールスタッフ数
+MONITOR_RESOURCES = False  # スタッフの稼働状況を記録するか
 
 # メニュー設定
 MENU = {
     "ラーメン": {
         "price": 800,
+        "order_weight": 1.0,  # 注文されやすさ（相対値）
         "cooking_time_mean": 10,  # 分
         "cooking_time_std": 2,    # 分
         "ingredients": {
@@ -27,6 +29,7 @@ MENU = {
     },
     "餃子": {
         "price": 500,
+        "order_weight": 1.0,
         "cooking_time_mean": 8,
         "cooking_time_std": 1,
         "ingredients": {
@@ -37,6 +40,7 @@ MENU = {
     },
     "チャーハン": {
         "price": 700,
+        "order_weight": 1.0,
         "cooking_time_mean": 7,
         "cooking_time_std": 1,
         "ingredients": {
@@ -48,6 +52,7 @@ MENU = {
     },
     "唐揚げ": {
         "price": 600,
+        "order_weight": 1.0,
         "cooking_time_mean": 12,
         "cooking_time_std": 2,
         "ingredients": {
@@ -58,6 +63,7 @@ MENU = {
     },
     "ビール": {
         "price": 500,
+        "order_weight": 1.0,
         "cooking_time_mean": 1,
         "cooking_time_std": 0.5,
         "ingredients": {
@@ -94,6 +100,19 @@ CUSTOMER_PARAMS = {
     }
 }
 
+# 忍耐度（待てる最大時間）の範囲（分）
+PATIENCE_RANGE = (10, 30)
+
+# 食事時間の範囲（分）
+EATING_TIME_RANGE = (15, 30)
+
+# 会計処理時間の範囲（分）
+CHECKOUT_TIME_RANGE = (3, 5)
+
+# 待ち行列の長さによる来客の減少（1組あたりの減少率と、来客数の倍率の下限）
+QUEUE_ARRIVAL_DECAY = 0.05
+MIN_QUEUE_ARRIVAL_FACTOR = 0.1
+
 # 天候影響係数
 WEATHER_FACTORS = {
     "sunny": 1.0,
@@ -0,0 +1,229 @@
+"""
+営業途中の状態のスナップショットと what-if 分岐
+
+指定した時刻までシミュレーションを実行してモデルの状態（待ち行列、着席中の顧客と
+各段階の残り時間、スタッフの使用状況、材料の在庫、指標、乱数の状態）を保存し、
+そこからスタッフ数・席数・在庫を変えた複数の分岐を並列に実行する。
+分岐ごとに開店から実行し直す必要がないため、共通部分の計算を省略できる。
+
+顧客の到着は指数分布（無記憶性）に従うため、到着プロセスは分岐時点から新たに開始する。
+"""
+
+import argparse
+import copy
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import simpy
+
+from restaurant_simulation import (
+    CUSTOMER_PARAMS, Customer, Restaurant, build_simulation, continue_customer_behavior,
+    customer_generator, finalize_metrics
+)
+from resource_monitor import update_resources
+
+# スタッフを確保している段階・スタッフを待っている段階
+HOLDING_PHASES = ("cooking", "checkout")
+QUEUED_PHASES = ("kitchen_queue", "checkout_queue")
+
+CUSTOMER_STATE_FIELDS = [
+    "group_size", "patience", "arrival_time", "seating_time", "orders", "is_seated",
+    "phase", "patience_end", "wake_time", "requested_at", "granted_at",
+]
+
+
+class SimulationSnapshot:
+    """ある時刻におけるシミュレーションの状態（プロセス間で受け渡せる形式）"""
+    def __init__(self, restaurant, customer_params, weather_schedule):
+        update_resources(restaurant.kitchen_staff, restaurant.hall_staff)
+
+        self.time = restaurant.env.now
+
+        # レストランの設定
+        self.config = {
+            "seats": restaurant.seats,
+            "menu_items": restaurant.menu.items,
+            "ingredients_data": {
+                name: {"initial_stock": ing.initial_stock, "cost": ing.cost}
+                for name, ing in restaurant.ingredients.items()
+            },
+            "opening_hour": restaurant.opening_time / 60,
+            "closing_hour": restaurant.closing_time / 60,
+            "kitchen_staff": restaurant.kitchen_staff.capacity,
+            "hall_staff": restaurant.hall_staff.capacity,
+            "patience_range": restaurant.patience_range,
+            "eating_time_range": restaurant.eating_time_range,
+            "days": restaurant.days,
+            "monitor_resources": restaurant.monitor_resources,
+        }
+        self.customer_params = copy.deepcopy(customer_params)
+        self.weather_schedule = dict(weather_schedule)
+
+        # 顧客（待ち行列の順、着席順）
+        self.waiting_line = [self._customer_state(c) for c in restaurant.waiting_line]
+        self.seated_customers = [self._customer_state(c) for c in restaurant.seated_customers]
+
+        # 材料の在庫
+        self.ingredient_stock = {
+            name: (ing.current_stock, ing.used_amount) for name, ing in restaurant.ingredients.items()
+        }
+
+        # 指標と乱数の状態
+        self.metrics = copy.deepcopy(restaurant.metrics)
+        self.random_state = random.getstate()
+        self.numpy_random_state = np.random.get_state()
+
+    @staticmethod
+    def _customer_state(customer):
+        """顧客の状態を辞書に変換"""
+        state = {field: getattr(customer, field) for field in CUSTOMER_STATE_FIELDS}
+        state["orders"] = list(customer.orders)
+        return state
+
+
+def take_snapshot(restaurant, customer_params=CUSTOMER_PARAMS, weather_schedule=None):
+    """現在のシミュレーションの状態を保存"""
+    return SimulationSnapshot(restaurant, customer_params, weather_schedule or {0: "sunny"})
+
+
+def _restore_customer(env, state):
+    """辞書から顧客を復元"""
+    customer = Customer(env, state["group_size"], state["patience"])
+    for field in CUSTOMER_STATE_FIELDS:
+        setattr(customer, field, state[field])
+    customer.orders = list(state["orders"])
+    return customer
+
+
+def restore_snapshot(snapshot, kitchen_staff=None, hall_staff=None, seats=None, ingredient_stock=None,
+                     seed=None):
+    """スナップショットから新しいシミュレーション環境を作成
+
+    kitchen_staff・hall_staff・seats を指定するとその値に変更して再開する。スタッフを
+    作業中の人数より減らした場合、作業中の分はそのまま終え、減らした人数は新しい割り当てから
+    適用する。定員を超えた分はリソースを使わずに終えるが、モニタリング中なら終了時に
+    稼働時間と使用時間を集計に加える（その間の稼働人数は定員を上回る）。
+    ingredient_stock（材料名 → 在庫量）で在庫を変更でき、増やした分は仕入れとして
+    コストに含める。seed を省略すると保存時の乱数の状態から再開する（分岐間で共通乱数）。
+    戻り値は (env, restaurant)。
+    """
+    config = dict(snapshot.config)
+    if kitchen_staff is not None:
+        config["kitchen_staff"] = kitchen_staff
+    if hall_staff is not None:
+        config["hall_staff"] = hall_staff
+    if seats is not None:
+        config["seats"] = seats
+
+    env = simpy.Environment(initial_time=snapshot.time)
+    restaurant = Restaurant(env=env, metrics=copy.deepcopy(snapshot.metrics), **config)
+
+    # 材料の在庫
+    for name, (current_stock, used_amount) in snapshot.ingredient_stock.items():
+        ing = restaurant.ingredients[name]
+        ing.current_stock = current_stock
+        ing.used_amount = used_amount
+    for name, amount in (ingredient_stock or {}).items():
+        ing = restaurant.ingredients[name]
+        ing.initial_stock += max(0, amount - ing.current_stock)
+        ing.current_stock = amount
+
+    # 顧客と席
+    restaurant.waiting_line = [_restore_customer(env, state) for state in snapshot.waiting_line]
+    restaurant.seated_customers = [_restore_customer(env, state) for state in snapshot.seated_customers]
+    restaurant.available_seats = restaurant.seats - sum(c.group_size for c in restaurant.seated_customers)
+
+    # 乱数の状態
+    if seed is None:
+        random.setstate(snapshot.random_state)
+        np.random.set_state(snapshot.numpy_random_state)
+    else:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    # スタッフを確保していた顧客から順に再開し、スタッフの割り当て順を保つ
+    customers = restaurant.seated_customers + restaurant.waiting_line
+    holding = sorted((c for c in customers if c.phase in HOLDING_PHASES), key=lambda c: c.granted_at)
+    queued = sorted((c for c in customers if c.phase in QUEUED_PHASES), key=lambda c: c.requested_at)
+    others = [c for c in customers if c.phase not in HOLDING_PHASES + QUEUED_PHASES]
+    for customer in holding + queued + others:
+        env.process(continue_customer_behavior(env, customer, restaurant))
+
+    env.process(customer_generator(env, restaurant, snapshot.customer_params, snapshot.weather_schedule))
+    return env, restaurant
+
+
+def run_branch(snapshot, until=None, **overrides):
+    """スナップショットから分岐を1つ実行して指標を返す
+
+    overrides は restore_snapshot のキーワード引数。until を省略すると最終日の終わりまで実行する。
+    """
+    env, restaurant = restore_snapshot(snapshot, **overrides)
+    env.run(until=until if until is not None else restaurant.days * 24 * 60)
+    return finalize_metrics(restaurant)
+
+
+def _run_branch_task(task):
+    """プロセスプールのワーカーで分岐を実行"""
+    snapshot, until, overrides = task
+    return run_branch(snapshot, until=until, **overrides)
+
+
+def run_branches(snapshot, branches, until=None, workers=None):
+    """スナップショットから複数の分岐を並列に実行
+
+    branches は restore_snapshot のキーワード引数の辞書のリスト。
+    戻り値は branches と同じ順の指標のリスト。
+    """
+    tasks = [(snapshot, until, overrides) for overrides in branches]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_branch_task, tasks))
+
+
+def simulate_until(snapshot_time, seed=None, **kwargs):
+    """指定時刻までシミュレーションを実行し、その時点のスナップショットを返す
+
+    キーワード引数は build_simulation に渡す。
+    """
+    env, restaurant = build_simulation(seed=seed, **kwargs)
+    env.run(until=snapshot_time)
+    return take_snapshot(
+        restaurant, kwargs.get("customer_params", CUSTOMER_PARAMS), kwargs.get("weather_schedule")
+    )
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="営業途中のスナップショットからの what-if 分岐")
+    parser.add_argument("--at", type=float, default=18.0, help="分岐する時刻（時）")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    snapshot = simulate_until(args.at * 60, seed=args.seed, monitor_resources=True)
+    prefix_seconds = time.perf_counter() - started
+
+    branches = [
+        ("そのまま", {}),
+        ("調理スタッフ +1", {"kitchen_staff": snapshot.config["kitchen_staff"] + 1}),
+        ("ホールスタッフ +1", {"hall_staff": snapshot.config["hall_staff"] + 1}),
+        ("席数 +10", {"seats": snapshot.config["seats"] + 10}),
+    ]
+    started = time.perf_counter()
+    results = run_branches(snapshot, [overrides for _, overrides in branches], workers=args.workers)
+    branch_seconds = time.perf_counter() - started
+
+    print(f"\n===== {args.at:g}時時点からの what-if 分岐 =====")
+    print(f"分岐時点の待ち行列: {len(snapshot.waiting_line)}組, 着席中: {len(snapshot.seated_customers)}組")
+    for (name, _), metrics in zip(branches, results):
+        print(f"  {name}: 純利益 {metrics.total_profit:.0f}円, "
+              f"キャンセル率 {metrics.walkout_rate * 100:.1f}%, 平均待ち時間 {metrics.avg_waiting_time:.1f}分")
+    print(f"\n共通部分の実行時間: {prefix_seconds:.2f}秒（{len(branches)}分岐で共有）")
+    print(f"分岐の実行時間: {branch_seconds:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()